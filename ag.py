@@ -1,21 +1,84 @@
-import random
+import os
+import sys
+import time
 import math
+import random
+import hashlib
+import weakref
+import threading
+import multiprocessing
+from array import array
+from collections import OrderedDict, Counter
+import numpy as np
 from deap import base, creator, tools, algorithms
+from sqlalchemy import func, select, exists
 from sqlalchemy.orm import joinedload
-from db import get_session, Professor, Oferta, SemestreLetivo, Disciplina
+from db import (
+    session_scope, data_version, Professor, Oferta, SemestreLetivo, Disciplina, Alocacao, AreaCompetencia
+)
+from problem import ProblemInstance, genome_matrix
+from competence import get_competence_index
+from checkpoint import (
+    CHECKPOINT_DIR, Checkpointer, checkpoint_path, load_checkpoint, new_run_id, save_best, load_best
+)
 
+# Classes de Fitness e Individual criadas uma única vez, no import do módulo,
+# para que processos filhos consigam desserializar indivíduos.
+# O indivíduo é um array('i') com o índice denso do professor de cada oferta.
+if not hasattr(creator, "FitnessMax"):
+    creator.create("FitnessMax", base.Fitness, weights=(1.0,))
+if not hasattr(creator, "Individual"):
+    creator.create("Individual", array, typecode="i", fitness=creator.FitnessMax)
 
-from sqlalchemy.orm import joinedload
-from db import get_session, Professor, Oferta, SemestreLetivo, Disciplina
 
-def load_data(semestre_nome: str):
-    session = get_session()
-    try:
-        professores = (
-            session.query(Professor)
-                   .options(joinedload(Professor.areas))
-                   .all()
-        )
+# Modos de carga de `load_data`
+LOAD_MODES = ("orm", "core")
+
+
+def professor_select():
+    """Colunas dos professores na ordem de `problem.PROFESSOR_COLUMNS`."""
+    return (
+        select(Professor.id, Professor.nome, Professor.titulacao, Professor.nivel,
+               Professor.carga_maxima, Professor.modelo_contratacao)
+        .order_by(Professor.id)
+    )
+
+
+def pending_ofertas_select(*extra):
+    """
+    Ofertas sem nenhuma alocação, com as colunas da disciplina e da área na
+    ordem de `problem.OFERTA_COLUMNS` (mais as colunas `extra`). O filtro de
+    semestre fica por conta de quem chama.
+    """
+    return (
+        select(Oferta.id, Oferta.turma, Oferta.disciplina_id, Disciplina.nome, Disciplina.carga_horaria,
+               Disciplina.nivel_esperado, AreaCompetencia.id, AreaCompetencia.nome, *extra)
+        .join(Disciplina, Oferta.disciplina_id == Disciplina.id)
+        .join(AreaCompetencia, Disciplina.area_id == AreaCompetencia.id)
+        .join(SemestreLetivo, Oferta.semestre_id == SemestreLetivo.id)
+        .where(~exists().where(Alocacao.oferta_id == Oferta.id))
+        .order_by(Oferta.id)
+    )
+
+
+def load_data(semestre_nome: str, mode="orm"):
+    """
+    Professores e ofertas pendentes do semestre. `mode="orm"` devolve objetos
+    `Professor`/`Oferta` (com disciplina e área carregadas); `mode="core"`
+    devolve tuplas de consultas Core, sem mapa de identidade nem linhas de
+    join duplicadas, para `ProblemInstance.from_rows`. As competências não
+    são lidas aqui: vêm do índice compartilhado (ver `build_problem`).
+    """
+    if mode not in LOAD_MODES:
+        raise ValueError(f"Modo de carga desconhecido: {mode!r}")
+    with session_scope() as session:
+        if mode == "core":
+            professores = session.execute(professor_select()).all()
+            ofertas = session.execute(
+                pending_ofertas_select().where(SemestreLetivo.nome == semestre_nome)
+            ).all()
+            return professores, ofertas
+        professores = session.query(Professor).order_by(Professor.id).all()
         ofertas = (
             session.query(Oferta)
                    .join(Oferta.semestre)
@@ -28,121 +91,1265 @@ def load_data(semestre_nome: str):
                        # filtra apenas ofertas que não tenham nenhuma alocação
                        ~Oferta.alocacoes.any()
                    )
+                   .order_by(Oferta.id)
                    .all()
         )
         return professores, ofertas
-    finally:
-        session.close()
-
-
-def evaluate_fitness(individual, professores, ofertas):
-    P_c, B_c = 1000, 200
-    B_n = 50
-    P_h = 5000
-    P_u = 500
-    B_b = 100
-
-    # Map de carga e áreas por professor
-    prof_map = {p.id: p for p in professores}
-    carga = {p.id: 0.0 for p in professores}
-    prof_areas = {p.id: {a.id for a in p.areas} for p in professores}
-
-    total = 0.0
-    # 1 e 2: competência, nível e acumulação de carga
-    for idx, prof_id in enumerate(individual):
-        prof = prof_map.get(prof_id)
-        oferta = ofertas[idx]
-        # Cobertura de competência
-        if oferta.disciplina.area.id not in prof_areas[prof_id]:
-            total -= P_c
-        else:
-            total += B_c
-        # Nível de titulação
-        if prof.nivel >= oferta.disciplina.nivel_esperado:
-            total += B_n
-        # Soma carga
-        carga[prof_id] += float(oferta.disciplina.carga_horaria)
+
+
+def load_existing_load(semestre_nome):
+    """Horas já alocadas a cada professor no semestre: {professor_id: SUM(carga_horaria)}."""
+    with session_scope() as session:
+        rows = (
+            session.query(Alocacao.professor_id, func.sum(Disciplina.carga_horaria))
+                   .join(Oferta, Alocacao.oferta_id == Oferta.id)
+                   .join(Disciplina, Oferta.disciplina_id == Disciplina.id)
+                   .join(SemestreLetivo, Oferta.semestre_id == SemestreLetivo.id)
+                   .filter(SemestreLetivo.nome == semestre_nome)
+                   .group_by(Alocacao.professor_id)
+                   .all()
+        )
+        return {prof_id: float(horas) for prof_id, horas in rows}
+
+
+def load_previous_allocations(semestre_nome, disciplina_ids):
+    """
+    Professor da alocação mais recente de cada disciplina em semestres letivos
+    anteriores a `semestre_nome` (pela data de início): {disciplina_id: professor_id}.
+    """
+    with session_scope() as session:
+        atual = session.query(SemestreLetivo).filter_by(nome=semestre_nome).first()
+        if atual is None or len(disciplina_ids) == 0:
+            return {}
+        rows = (
+            session.query(Oferta.disciplina_id, Alocacao.professor_id)
+                   .join(Alocacao, Alocacao.oferta_id == Oferta.id)
+                   .join(Oferta.semestre)
+                   .filter(
+                       SemestreLetivo.data_inicio < atual.data_inicio,
+                       Oferta.disciplina_id.in_([int(d) for d in set(disciplina_ids)])
+                   )
+                   # DISTINCT ON (disciplina_id): fica a linha do semestre mais recente
+                   .order_by(Oferta.disciplina_id, SemestreLetivo.data_inicio.desc(), Alocacao.id.desc())
+                   .distinct(Oferta.disciplina_id)
+                   .all()
+        )
+        return dict(rows)
+
+
+# Pesos dos critérios de fitness (ver tabela no README)
+P_c, B_c = 1000, 200
+B_n = 50
+P_h = 5000
+P_u = 500
+B_b = 100
+
+
+def evaluate_fitness(individual, problem):
+    """Fitness de um único indivíduo (mesmo kernel de `evaluate_population`)."""
+    return (float(evaluate_population([individual], problem)[0]),)
+
+
+def evaluate_population(population, problem):
+    """
+    Avalia a população inteira de uma vez como matriz (indivíduos x ofertas).
+    Cada gene é o índice denso do professor no `ProblemInstance`.
+    Retorna um vetor com o fitness de cada indivíduo.
+    """
+    idx = genome_matrix(population).astype(np.intp, copy=False)
+    # Carga do indivíduo somada às alocações já existentes no semestre
+    carga = _load_matrix(idx, problem) + problem.carga_base
+    return _gene_scores(idx, problem).sum(axis=1) + _load_scores(carga, problem)
+
+
+def _gene_scores(idx, problem, ofertas=None):
+    """Critérios 1 e 2 (competência e nível de titulação) de cada gene de `idx`."""
+    ofertas = slice(None) if ofertas is None else ofertas
+    comp = problem.compete(idx, problem.oferta_area[ofertas])
+    nivel = problem.prof_nivel[idx] >= problem.nivel_esperado[ofertas]
+    return np.where(comp, B_c, -P_c) + B_n * nivel
+
+
+def _load_scores(carga, problem):
+    """Critérios 3 a 5, que só dependem da matriz de carga (indivíduos x professores)."""
+    carga_maxima = problem.carga_maxima
 
     # 3: respeito à carga máxima
-    for p in professores:
-        C = carga[p.id]
-        # TODO considerar as alocações já existentes
-        max_load = float(p.carga_maxima)
-        if C > max_load:
-            total -= P_h * (C - max_load)
+    total = -P_h * np.maximum(carga - carga_maxima, 0.0).sum(axis=1)
 
     # 4: utilização do corpo docente
-    M = len(professores)
-    U = sum(1 for v in carga.values() if v > 0)
-    total -= P_u * (M - U) ** 2
+    U = (carga > 0).sum(axis=1)
+    total -= P_u * (problem.n_profs - U) ** 2
 
     # 5: balanceamento relativo de carga
-    ratios = [(carga[p.id] / float(p.carga_maxima)) if p.carga_maxima > 0 else 0.0 for p in professores]
-    mean_r = sum(ratios) / len(ratios)
-    variance = sum((r - mean_r) ** 2 for r in ratios) / len(ratios)
-    sigma_r = math.sqrt(variance)
-    total += B_b * (1 - min(max(sigma_r, 0.0), 1.0))
+    ratios = np.divide(
+        carga, carga_maxima,
+        out=np.zeros_like(carga),
+        where=carga_maxima > 0
+    )
+    sigma_r = ratios.std(axis=1)
+    total += B_b * (1 - np.clip(sigma_r, 0.0, 1.0))
 
-    return (total,)
+    return total
 
 
-def setup_representation(professores, ofertas):
-    # Cria classes de Fitness e Individual apenas uma vez
-    if not hasattr(creator, "FitnessMax"):
-        creator.create("FitnessMax", base.Fitness, weights=(1.0,))
-    if not hasattr(creator, "Individual"):
-        creator.create("Individual", list, fitness=creator.FitnessMax)
+def fitness_breakdown(individual, problem):
+    """Parcela de cada critério no fitness de um indivíduo (a soma é o fitness)."""
+    idx = genome_matrix(individual)[0].astype(np.intp)
+    carga = problem.carga_total(idx)
+    ratios = np.divide(
+        carga, problem.carga_maxima,
+        out=np.zeros_like(carga),
+        where=problem.carga_maxima > 0
+    )
+    return {
+        "competencia": float(np.where(problem.compete(idx, problem.oferta_area), B_c, -P_c).sum()),
+        "nivel": float(B_n * (problem.prof_nivel[idx] >= problem.nivel_esperado).sum()),
+        "carga_maxima": float(-P_h * np.maximum(carga - problem.carga_maxima, 0.0).sum()),
+        "utilizacao": float(-P_u * (problem.n_profs - (carga > 0).sum()) ** 2),
+        "balanceamento": float(B_b * (1 - np.clip(ratios.std(), 0.0, 1.0))),
+    }
 
-    prof_ids = [p.id for p in professores]
-    N_OFFERS = len(ofertas)
 
-    toolbox = base.Toolbox()
-    toolbox.register("attr_professor", random.choice, prof_ids)
-    toolbox.register(
-        "individual",
-        tools.initRepeat,
-        creator.Individual,
-        toolbox.attr_professor,
-        n=N_OFFERS
+def _load_matrix(idx, problem):
+    """Horas de cada professor para cada linha de `idx` (bincount com deslocamento por linha)."""
+    n_ind, n_ofertas = idx.shape
+    flat = (idx + (np.arange(n_ind) * problem.n_profs)[:, np.newaxis]).ravel()
+    pesos = np.broadcast_to(problem.carga_horaria, (n_ind, n_ofertas)).ravel()
+    return np.bincount(flat, weights=pesos, minlength=n_ind * problem.n_profs).reshape(n_ind, problem.n_profs)
+
+
+# Instância do problema em cada processo do pool, recebida uma vez na inicialização
+_worker_problem = None
+
+
+def _init_worker(problem):
+    global _worker_problem
+    _worker_problem = problem
+
+
+def _evaluate_chunk(genes):
+    return evaluate_population(genes, _worker_problem)
+
+
+def _shutdown_pool(pool):
+    pool.terminate()
+    pool.join()
+
+
+class EvaluatorPool:
+    """
+    Pool persistente de processos para avaliar a população em paralelo.
+
+    Os workers recebem o `ProblemInstance` uma única vez, na inicialização;
+    cada tarefa leva apenas um bloco da matriz de genomas. O pool é encerrado
+    por `close()`, ao sair do `with` ou quando o objeto é coletado (por exemplo,
+    quando a sessão do Streamlit que o guardava termina).
+    """
+
+    def __init__(self, problem, workers=None, chunksize=None):
+        self.problem = problem
+        self.workers = workers or multiprocessing.cpu_count()
+        self.chunksize = chunksize
+        ctx = multiprocessing.get_context("spawn")
+        self._pool = ctx.Pool(self.workers, initializer=_init_worker, initargs=(problem,))
+        self._finalizer = weakref.finalize(self, _shutdown_pool, self._pool)
+
+    def __call__(self, population):
+        genes = genome_matrix(population)
+        chunksize = self.chunksize or -(-len(genes) // (2 * self.workers))
+        chunks = [genes[i:i + chunksize] for i in range(0, len(genes), chunksize)]
+        return np.concatenate(self._pool.map(_evaluate_chunk, chunks))
+
+    @property
+    def closed(self):
+        return not self._finalizer.alive
+
+    def close(self):
+        self._finalizer()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class _Avaliado:
+    """
+    Resultado da avaliação guardado no indivíduo (`individual.avaliado`):
+    genoma avaliado, soma dos critérios 1 e 2, vetor de carga por professor
+    e quantos passos incrementais o produziram. É imutável, então a clonagem
+    do DEAP compartilha a mesma instância entre pai e filhos.
+    """
+
+    __slots__ = ("genes", "genes_score", "carga", "passos")
+
+    def __init__(self, genes, genes_score, carga, passos):
+        self.genes = genes
+        self.genes_score = genes_score
+        self.carga = carga
+        self.passos = passos
+
+    def __deepcopy__(self, memo):
+        return self
+
+
+class IncrementalEvaluator:
+    """
+    Avaliação em lote que reaproveita o resultado do pai. Cada indivíduo
+    avaliado guarda um `_Avaliado`, herdado pelos clones; um filho que
+    difere do genoma guardado em no máximo `max_changed` das ofertas (o
+    filho só mutado, ou o do crossover entre pais já parecidos) é
+    reavaliado em O(genes alterados + professores): os critérios 1 e 2
+    mudam só nos genes alterados e a carga é a do pai com as horas
+    movidas entre professores. Os demais passam por `evaluate_population`.
+    Depois de `max_steps` passos encadeados a avaliação volta a ser
+    completa, descartando o erro de arredondamento acumulado na carga.
+    """
+
+    def __init__(self, problem, max_changed=0.1, max_steps=50):
+        self.problem = problem
+        self.max_changed = max_changed
+        self.max_steps = max_steps
+        self.incremental = 0
+        self.full = 0
+
+    def __call__(self, population):
+        problem = self.problem
+        genes = genome_matrix(population)
+        n, n_profs = len(genes), problem.n_profs
+        avaliados = [getattr(ind, "avaliado", None) for ind in population]
+        delta = [i for i, a in enumerate(avaliados) if a is not None and a.passos < self.max_steps]
+        if delta:
+            base = np.vstack([avaliados[i].genes for i in delta])
+            diff = genes[delta] != base
+            poucos = diff.sum(axis=1) <= self.max_changed * problem.n_ofertas
+            delta = [i for i, ok in zip(delta, poucos) if ok]
+            base, diff = base[poucos], diff[poucos]
+        completos = np.setdiff1d(np.arange(n), delta)
+
+        genes_score = np.empty(n)
+        carga = np.empty((n, n_profs))
+        passos = np.zeros(n, dtype=np.int64)
+        if len(completos):
+            idx = genes[completos].astype(np.intp)
+            genes_score[completos] = _gene_scores(idx, problem).sum(axis=1)
+            carga[completos] = _load_matrix(idx, problem) + problem.carga_base
+        if delta:
+            pais = [avaliados[i] for i in delta]
+            m = len(delta)
+            linhas, ofertas = np.nonzero(diff)
+            novo = genes[delta][linhas, ofertas].astype(np.intp)
+            velho = base[linhas, ofertas].astype(np.intp)
+            ganho = _gene_scores(novo, problem, ofertas) - _gene_scores(velho, problem, ofertas)
+            genes_score[delta] = (
+                np.array([a.genes_score for a in pais]) + np.bincount(linhas, weights=ganho, minlength=m)
+            )
+            # Horas da oferta saem do professor antigo e entram no novo
+            horas = problem.carga_horaria[ofertas]
+            movida = np.bincount(
+                np.concatenate((linhas * n_profs + novo, linhas * n_profs + velho)),
+                weights=np.concatenate((horas, -horas)),
+                minlength=m * n_profs
+            )
+            carga_delta = np.vstack([a.carga for a in pais])
+            carga_delta += movida.reshape(m, n_profs)
+            # Professor que ficou sem horas volta a zero exato (critério 4 usa carga > 0)
+            carga_delta[carga_delta < 1e-6] = 0.0
+            carga[delta] = carga_delta
+            passos[delta] = [a.passos + 1 for a in pais]
+
+        fitness = genes_score + _load_scores(carga, problem)
+        for i, ind in enumerate(population):
+            ind.avaliado = _Avaliado(genes[i], genes_score[i], carga[i], passos[i])
+        self.incremental += len(delta)
+        self.full += len(completos)
+        return fitness
+
+    def verify(self, population):
+        """Maior diferença entre o fitness guardado na população e o de `evaluate_population`."""
+        valid = [ind for ind in population if ind.fitness.valid]
+        if not valid:
+            return 0.0
+        esperado = evaluate_population(valid, self.problem)
+        return float(np.abs(esperado - np.array([ind.fitness.values[0] for ind in valid])).max())
+
+
+class FitnessCache:
+    """
+    Cache LRU de fitness indexado pelo hash (blake2b de 128 bits) dos bytes do genoma.
+    Com `maxsize=0` nada é guardado, mas duplicatas de uma mesma geração
+    continuam sendo avaliadas uma única vez.
+    """
+
+    def __init__(self, maxsize=50_000):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+
+    @staticmethod
+    def key(individual):
+        return hashlib.blake2b(individual, digest_size=16).digest()
+
+    def get(self, key):
+        fit = self._data.get(key)
+        if fit is None:
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return fit
+
+    def put(self, key, fit):
+        if self.maxsize <= 0:
+            return
+        self._data[key] = fit
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def __len__(self):
+        return len(self._data)
+
+    @property
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    @property
+    def nbytes(self):
+        """Estimativa dos bytes ocupados: tabela do dict + chaves + valores."""
+        entrada = sys.getsizeof(b"\0" * 16) + sys.getsizeof(0.0)
+        return sys.getsizeof(self._data) + len(self._data) * entrada
+
+
+def evaluate_invalid(population, toolbox, cache=None):
+    """
+    Avalia em lote os indivíduos sem fitness válido; retorna quantos foram
+    efetivamente avaliados. Com `cache`, genomas já conhecidos não são
+    reavaliados e duplicatas da mesma geração são avaliadas uma só vez.
+    """
+    invalid = [ind for ind in population if not ind.fitness.valid]
+    if not invalid:
+        return 0
+    if cache is None:
+        for ind, fit in zip(invalid, toolbox.evaluate_population(invalid)):
+            ind.fitness.values = (float(fit),)
+        return len(invalid)
+
+    pendentes = {}
+    for ind in invalid:
+        key = cache.key(ind)
+        fit = cache.get(key)
+        if fit is not None:
+            ind.fitness.values = (fit,)
+        else:
+            pendentes.setdefault(key, []).append(ind)
+    if pendentes:
+        unicos = [grupo[0] for grupo in pendentes.values()]
+        for (key, grupo), fit in zip(pendentes.items(), toolbox.evaluate_population(unicos)):
+            fit = float(fit)
+            cache.put(key, fit)
+            for ind in grupo:
+                ind.fitness.values = (fit,)
+    return len(pendentes)
+
+
+def init_individual(problem):
+    """Sorteia, para cada oferta, um professor entre os candidatos da sua área."""
+    rng = np.random.default_rng(random.getrandbits(64))
+    genes = np.empty(problem.n_ofertas, dtype=np.intc)
+    for a, cands in enumerate(problem.candidatos()):
+        ofertas = np.flatnonzero(problem.oferta_area == a)
+        if len(ofertas):
+            genes[ofertas] = cands[rng.integers(len(cands), size=len(ofertas))]
+    return creator.Individual(genes.tobytes())
+
+
+def init_greedy(problem):
+    """
+    Semente gulosa: percorre as ofertas em ordem aleatória e entrega cada uma ao
+    candidato competente com a maior fração livre de `carga_maxima`, preferindo
+    quem ainda cabe na carga e tem o nível esperado.
+    """
+    rng = np.random.default_rng(random.getrandbits(64))
+    livre = problem.carga_maxima - problem.carga_base
+    genes = [0] * problem.n_ofertas
+    ordem = list(range(problem.n_ofertas))
+    random.shuffle(ordem)
+    for j in ordem:
+        ch = problem.carga_horaria[j]
+        cands = problem.candidatos_oferta(j)
+        cabe = livre[cands] >= ch
+        nivel = problem.prof_nivel[cands] >= problem.nivel_esperado[j]
+        fracao = np.divide(
+            livre[cands], problem.carga_maxima[cands],
+            out=np.zeros(len(cands)),
+            where=problem.carga_maxima[cands] > 0
+        )
+        # Critérios em ordem de prioridade, com desempate aleatório
+        score = 4.0 * cabe + 2.0 * nivel + fracao + 1e-6 * rng.random(len(cands))
+        prof = int(cands[np.argmax(score)])
+        genes[j] = prof
+        livre[prof] -= ch
+    return creator.Individual(genes)
+
+
+def init_population(n, problem, seed_fraction=0.0):
+    """População inicial: `seed_fraction` gulosa e o restante sorteado nos domínios."""
+    n_greedy = int(round(n * seed_fraction))
+    return (
+        [init_greedy(problem) for _ in range(n_greedy)]
+        + [init_individual(problem) for _ in range(n - n_greedy)]
     )
-    toolbox.register("population", tools.initRepeat, list, toolbox.individual)
 
-    toolbox.register("select", tools.selTournament, tournsize=3)
-    toolbox.register("mate", tools.cxOnePoint)
-    toolbox.register("mutate", tools.mutShuffleIndexes, indpb=0.05)
 
-    # Avaliação com binding por nome para manter ordem de parâmetros
-    toolbox.register(
-        "evaluate",
-        evaluate_fitness,
-        professores=professores,
-        ofertas=ofertas
+def mut_reassign(individual, problem, indpb):
+    """Com probabilidade `indpb` por gene, troca o professor por outro candidato da área da oferta."""
+    for j in range(len(individual)):
+        if random.random() < indpb:
+            cands = problem.candidatos_oferta(j)
+            individual[j] = int(cands[random.randrange(len(cands))])
+    return individual,
+
+
+def _move_oferta(genes, carga, problem, j, origem):
+    """Move a oferta `j` para o candidato com mais folga que a comporte; retorna se moveu."""
+    ch = problem.carga_horaria[j]
+    cands = problem.candidatos_oferta(j)
+    folga = problem.carga_maxima[cands] - carga[cands]
+    ok = (folga >= ch) & (cands != origem)
+    if not ok.any():
+        return False
+    destino = int(cands[np.argmax(np.where(ok, folga, -np.inf))])
+    genes[j] = destino
+    carga[origem] -= ch
+    carga[destino] += ch
+    return True
+
+
+def _sobrecarregados(genes, carga, problem):
+    """
+    Professores acima de `carga_maxima` que têm ao menos uma oferta no genoma.
+    Quem está sobrecarregado só pela carga já existente não tem o que ceder.
+    """
+    donos = np.bincount(genes, minlength=problem.n_profs) > 0
+    return np.flatnonzero((carga > problem.carga_maxima) & donos)
+
+
+def mut_shift_load(individual, problem):
+    """
+    Tira uma oferta de um professor sobrecarregado e a entrega a um candidato
+    competente com folga. Sem sobrecarga (entre os professores com ofertas
+    no genoma), reatribui uma oferta ao acaso.
+    """
+    genes = np.frombuffer(individual, dtype=np.intc)
+    carga = problem.carga_total(genes)
+    sobrecarregados = _sobrecarregados(genes, carga, problem)
+    if len(sobrecarregados) == 0:
+        j = random.randrange(len(individual))
+        cands = problem.candidatos_oferta(j)
+        individual[j] = int(cands[random.randrange(len(cands))])
+        return individual,
+    origem = int(sobrecarregados[random.randrange(len(sobrecarregados))])
+    ofertas = np.flatnonzero(genes == origem)
+    _move_oferta(genes, carga, problem, int(ofertas[random.randrange(len(ofertas))]), origem)
+    return individual,
+
+
+def repair(individual, problem):
+    """Tenta respeitar `carga_maxima` movendo ofertas dos sobrecarregados para candidatos com folga."""
+    genes = np.frombuffer(individual, dtype=np.intc)
+    carga = problem.carga_total(genes)
+    sobrecarregados = _sobrecarregados(genes, carga, problem).tolist()
+    random.shuffle(sobrecarregados)
+    for origem in sobrecarregados:
+        ofertas = np.flatnonzero(genes == origem).tolist()
+        random.shuffle(ofertas)
+        for j in ofertas:
+            if carga[origem] <= problem.carga_maxima[origem]:
+                break
+            _move_oferta(genes, carga, problem, j, origem)
+    return individual
+
+
+def _counted(name, func, counts):
+    """Envolve um operador para contar suas aplicações em `counts[name]`."""
+    def wrapper(*args, **kwargs):
+        counts[name] += 1
+        return func(*args, **kwargs)
+    return wrapper
+
+
+# Operadores de mutação selecionáveis em `setup_representation`
+MUTATIONS = ("reassign", "shift", "mixed", "shuffle")
+
+
+def warm_start_templates(semestre_nome, problem, directory=CHECKPOINT_DIR):
+    """
+    Genomas parciais para warm start: a alocação anterior de cada disciplina
+    e a melhor alocação salva da última execução do semestre. Ofertas sem
+    informação (ou com professor que não está mais na instância) ficam com -1.
+    """
+    templates = []
+    anteriores = load_previous_allocations(semestre_nome, problem.disciplina_ids)
+    melhor = load_best(semestre_nome, directory)
+    fontes = (
+        (anteriores, problem.disciplina_ids),
+        (melhor, problem.oferta_ids),
     )
+    for mapa, chaves in fontes:
+        if not mapa:
+            continue
+        genes = np.array(
+            [problem.prof_pos.get(mapa.get(int(k)), -1) for k in chaves],
+            dtype=np.intc
+        )
+        if (genes >= 0).any():
+            templates.append(genes)
+    return templates
 
-    return toolbox, N_OFFERS, len(professores)
 
+def init_warm(problem, template, indpb=None):
+    """
+    Indivíduo a partir de um genoma parcial: completa os -1 nos domínios e
+    perturba levemente (por padrão, em média dois genes reatribuídos).
+    """
+    if indpb is None:
+        indpb = min(1.0, 2.0 / max(problem.n_ofertas, 1))
+    genes = np.frombuffer(init_individual(problem), dtype=np.intc).copy()
+    conhecidos = template >= 0
+    genes[conhecidos] = template[conhecidos]
+    individual = creator.Individual(genes.tobytes())
+    mut_reassign(individual, problem, indpb)
+    return individual
 
-def run_ga(semestre_nome, ngen=50, pop_size=100, cxpb=0.7, mutpb=0.2):
-    professores, ofertas = load_data(semestre_nome)
-    toolbox, N_OFFERS, N_PROFS = setup_representation(professores, ofertas)
 
-    random.seed()
-    pop = toolbox.population(n=pop_size)
+def setup_representation(problem, seed_fraction=0.0, mutation="reassign", indpb=0.05, repair_cx=False):
+    """
+    Monta o toolbox do AG. `mutation` escolhe o operador de mutação
+    (`reassign`, `shift`, `mixed` = metade de cada, ou `shuffle`, o
+    `mutShuffleIndexes` original) e `repair_cx` aplica `repair` nos filhos
+    do crossover. As aplicações de cada operador ficam em `toolbox.counts`.
+    """
+    if mutation not in MUTATIONS:
+        raise ValueError(f"Mutação desconhecida: {mutation!r}")
+    n_ofertas = problem.n_ofertas
+    n_profs = problem.n_profs
 
+    toolbox = base.Toolbox()
+    # Genes restritos aos professores competentes na área de cada oferta
+    toolbox.register("individual", init_individual, problem)
+    toolbox.register("population", init_population, problem=problem, seed_fraction=seed_fraction)
+
+    toolbox.register("select", tools.selTournament, tournsize=3)
+
+    counts = Counter()
+    toolbox.counts = counts
+    reassign = _counted("mut_reassign", mut_reassign, counts)
+    shift = _counted("mut_shift", mut_shift_load, counts)
+    counted_repair = _counted("repair", repair, counts)
+    crossover = _counted("cx", tools.cxOnePoint, counts)
+
+    if repair_cx:
+        def mate(ind1, ind2):
+            crossover(ind1, ind2)
+            return counted_repair(ind1, problem), counted_repair(ind2, problem)
+        toolbox.register("mate", mate)
+    else:
+        toolbox.register("mate", crossover)
+
+    if mutation == "reassign":
+        toolbox.register("mutate", reassign, problem=problem, indpb=indpb)
+    elif mutation == "shift":
+        toolbox.register("mutate", shift, problem=problem)
+    elif mutation == "mixed":
+        def mutate(individual):
+            if random.random() < 0.5:
+                return reassign(individual, problem=problem, indpb=indpb)
+            return shift(individual, problem=problem)
+        toolbox.register("mutate", mutate)
+    else:
+        toolbox.register("mutate", _counted("mut_shuffle", tools.mutShuffleIndexes, counts), indpb=indpb)
+
+    # Avaliação com binding por nome para manter ordem de parâmetros
+    toolbox.register("evaluate", evaluate_fitness, problem=problem)
+    # Avaliação vetorizada da população inteira
+    toolbox.register("evaluate_population", evaluate_population, problem=problem)
+
+    return toolbox, n_ofertas, n_profs
+
+
+def fitness_stats():
     stats = tools.Statistics(lambda ind: ind.fitness.values)
     stats.register("avg", lambda fits: sum(f[0] for f in fits) / len(fits))
     stats.register("min", lambda fits: min(f[0] for f in fits))
     stats.register("max", lambda fits: max(f[0] for f in fits))
+    return stats
+
+
+# Tabelas de que um `ProblemInstance` compilado depende (ver `db.data_version`)
+PROBLEM_TABLES = (
+    "professor", "area_competencia", "professor_area_competencia", "disciplina",
+    "semestre_letivo", "oferta", "alocacao"
+)
+
+
+class ProblemCache:
+    """
+    Cache LRU, compartilhado pelo processo, dos `ProblemInstance` compilados,
+    indexado por (semestre, modo de carga, versão dos dados). Um commit que
+    altera qualquer tabela de `PROBLEM_TABLES` muda a versão, e a entrada
+    antiga do semestre é descartada na próxima compilação. As instâncias são
+    compartilhadas entre sessões e não devem ser modificadas.
+    """
+
+    def __init__(self, maxsize=8):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            problem = self._data.get(key)
+            if problem is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return problem
+
+    def put(self, key, problem):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            # Versões anteriores do mesmo semestre não serão mais consultadas
+            for antiga in [k for k in self._data if k[:-1] == key[:-1]]:
+                del self._data[antiga]
+            self._data[key] = problem
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+problem_cache = ProblemCache(int(os.getenv("PROBLEM_CACHE_SIZE", "8")))
+
+
+def build_problem(semestre_nome, mode="core", use_cache=True):
+    """
+    Carrega o semestre e compila o `ProblemInstance` usado em toda a execução
+    (ver `load_data` para os modos de carga). Com `use_cache`, instâncias já
+    compiladas com a mesma versão dos dados vêm de `problem_cache`, sem ir ao
+    banco; escritas feitas fora do ORM deste processo exigem `db.invalidate_data`.
+    """
+    # Lida antes da carga: um commit concorrente invalida o que for compilado aqui
+    key = (semestre_nome, mode, data_version(*PROBLEM_TABLES))
+    if use_cache:
+        problem = problem_cache.get(key)
+        if problem is not None:
+            return problem
+
+    professores, ofertas = load_data(semestre_nome, mode)
+    carga = load_existing_load(semestre_nome)
+    if mode == "core":
+        problem = ProblemInstance.from_rows(professores, ofertas, get_competence_index(), carga)
+    else:
+        problem = ProblemInstance.from_orm(professores, ofertas, carga, index=get_competence_index())
+    if use_cache:
+        problem_cache.put(key, problem)
+    return problem
+
+
+def run_ga(semestre_nome, ngen=50, pop_size=100, cxpb=0.7, mutpb=0.2, problem=None,
+           workers=1, pool=None, cache_size=50_000, seed_fraction=0.0,
+           mutation="reassign", repair_cx=False, max_time=None, stagnation=None, epsilon=0.0,
+           target=None, callback=None, cancel=None, checkpoint_every=None, checkpoint_seconds=None,
+           checkpoint_dir=CHECKPOINT_DIR, run_id=None, resume=None, warm_start=0.0, save_best_run=False,
+           algorithm="simple", lambda_=None, warm_templates=None, instrument=False, incremental=True):
+    """
+    Executa o AG para o semestre. Com `workers > 1` (ou um `EvaluatorPool`
+    já aberto em `pool`, criado para os mesmos dados de `problem`; ver
+    `ProblemInstance.fingerprint`) a avaliação é feita em paralelo.
+    `cache_size` limita o número de genomas no cache LRU de fitness e
+    `seed_fraction` é a fração da população inicial gerada pela semente gulosa.
+    `mutation` e `repair_cx` selecionam os operadores (ver `setup_representation`).
+    `max_time`, `stagnation`/`epsilon` e `target` são critérios de parada
+    antecipada (ver `StoppingCriteria`); o que disparou fica em `log.stop_reason`.
+    `callback` recebe o registro do log de cada geração e `cancel` é
+    consultado a cada geração para interromper a execução.
+    Com `checkpoint_every` (gerações) e/ou `checkpoint_seconds` a execução é
+    salva em `checkpoint_dir/<semestre>/<run_id>.ckpt`; `resume` é o caminho
+    de um checkpoint a retomar, até `ngen` (o mesmo ou maior que o original).
+    A retomada usa as configurações salvas no checkpoint (`RESUME_PARAMS`),
+    não as recebidas; `ngen`, os critérios de parada e o paralelismo valem
+    como passados. Um checkpoint de outro `algorithm` é recusado.
+    `warm_start` é a fração da população semeada a partir das alocações
+    anteriores das disciplinas e do melhor genoma salvo do semestre
+    (`save_best_run=True` salva o melhor desta execução para a próxima).
+    `warm_templates` são os genomas de `warm_start_templates` já carregados;
+    quem roda em outra thread deve carregá-los antes, na thread da página.
+    `algorithm` escolhe o esquema de substituição (ver `ALGORITHMS`); nos
+    esquemas (μ+λ) e (μ,λ), μ é `pop_size` e `lambda_` (padrão 2μ) o número de filhos.
+    `instrument=True` registra no log o tempo por fase e a diversidade (ver `PhaseProfiler`).
+    `incremental=True` reavalia os filhos próximos do pai só pelos genes
+    alterados (ver `IncrementalEvaluator`); não se aplica à avaliação paralela.
+    """
+    if algorithm not in ALGORITHMS:
+        raise ValueError(f"Algoritmo desconhecido: {algorithm!r}")
+    if problem is None:
+        problem = build_problem(semestre_nome)
+
+    config = dict(
+        algorithm=algorithm, pop_size=pop_size, lambda_=lambda_, cxpb=cxpb, mutpb=mutpb,
+        seed_fraction=seed_fraction, mutation=mutation, repair_cx=repair_cx, instrument=instrument
+    )
+    state = None
+    if resume is not None:
+        state = load_checkpoint(resume, problem)
+        # Checkpoints antigos não têm as configurações: valem as recebidas
+        salvos = {k: v for k, v in state["params"].items() if k in RESUME_PARAMS}
+        if salvos.get("algorithm", algorithm) != algorithm:
+            raise ValueError(
+                f"O checkpoint foi gerado com o algoritmo {salvos['algorithm']!r}, não {algorithm!r}."
+            )
+        config.update(salvos)
+        pop_size, lambda_, cxpb, mutpb = config["pop_size"], config["lambda_"], config["cxpb"], config["mutpb"]
+        seed_fraction, mutation, repair_cx = config["seed_fraction"], config["mutation"], config["repair_cx"]
+        instrument = config["instrument"]
 
-    pop, log = algorithms.eaSimple(
-        population=pop,
-        toolbox=toolbox,
-        cxpb=cxpb,
-        mutpb=mutpb,
-        ngen=ngen,
-        stats=stats,
-        verbose=True
+    if algorithm != "simple" and cxpb + mutpb > 1.0:
+        raise ValueError("Nos esquemas (μ+λ) e (μ,λ) a soma das probabilidades de crossover e mutação deve ser no máximo 1.")
+    toolbox, N_OFFERS, N_PROFS = setup_representation(
+        problem, seed_fraction, mutation=mutation, repair_cx=repair_cx
     )
 
+    own_pool = None
+    if pool is None and workers > 1:
+        pool = own_pool = EvaluatorPool(problem, workers)
+    if pool is not None:
+        toolbox.register("evaluate_population", pool)
+    elif incremental:
+        toolbox.register("evaluate_population", IncrementalEvaluator(problem))
+
+    log = None
+    if state is not None:
+        pop = []
+        for genes, fit in zip(state["genes"], state["fitness"]):
+            ind = creator.Individual(genes.astype(np.intc).tobytes())
+            ind.fitness.values = (float(fit),)
+            pop.append(ind)
+        log = state["log"]
+        random.setstate(state["rng"])
+        run_id = run_id or os.path.splitext(os.path.basename(resume))[0]
+    else:
+        random.seed()
+        templates = warm_templates
+        if templates is None:
+            templates = warm_start_templates(semestre_nome, problem, checkpoint_dir) if warm_start > 0 else []
+        n_warm = int(round(pop_size * warm_start)) if templates else 0
+        pop = [init_warm(problem, templates[i % len(templates)]) for i in range(n_warm)]
+        pop += toolbox.population(n=pop_size - n_warm)
+    stats = fitness_stats()
+
+    checkpointer = None
+    if checkpoint_every or checkpoint_seconds:
+        path = checkpoint_path(checkpoint_dir, semestre_nome, run_id or new_run_id())
+        checkpointer = Checkpointer(path, problem, checkpoint_every, checkpoint_seconds, params=config)
+
+    try:
+        options = dict(
+            stats=stats,
+            verbose=True,
+            cache=FitnessCache(cache_size),
+            stop=StoppingCriteria(max_time, stagnation, epsilon, target, cancel),
+            callback=callback,
+            checkpoint=checkpointer,
+            log=log,
+            profiler=PhaseProfiler() if instrument else None
+        )
+        if algorithm == "simple":
+            pop, log = ea_simple(pop, toolbox, cxpb, mutpb, ngen, **options)
+        else:
+            pop, log = ea_mu_lambda(
+                pop, toolbox, pop_size, lambda_ or 2 * pop_size, cxpb, mutpb, ngen,
+                plus=(algorithm == "mu_plus_lambda"), **options
+            )
+    finally:
+        if own_pool is not None:
+            own_pool.close()
+
     best = tools.selBest(pop, 1)[0]
+    if save_best_run:
+        save_best(semestre_nome, problem, best, checkpoint_dir)
+    return best, log
+
+
+# Esquemas de substituição de `run_ga`
+ALGORITHMS = ("simple", "mu_plus_lambda", "mu_comma_lambda")
+
+# Configurações de `run_ga` gravadas no checkpoint e restauradas na retomada
+RESUME_PARAMS = (
+    "algorithm", "pop_size", "lambda_", "cxpb", "mutpb", "seed_fraction", "mutation", "repair_cx", "instrument"
+)
+
+
+def _cache_record(cache):
+    if cache is None:
+        return {}
+    return {"cache_hit": round(cache.hit_rate, 4), "cache_kb": round(cache.nbytes / 1024, 1)}
+
+
+# Colunas do log com as aplicações de cada operador por geração
+OPERATOR_FIELDS = ("cx", "mut_reassign", "mut_shift", "mut_shuffle", "repair")
+
+
+def _counts_record(toolbox):
+    counts = getattr(toolbox, "counts", None)
+    if counts is None:
+        return {}
+    record = {name: counts[name] for name in OPERATOR_FIELDS}
+    counts.clear()
+    return record
+
+
+class StoppingCriteria:
+    """
+    Critérios de parada antecipada, checados ao fim de cada geração:
+    tempo de parede (`max_time`, em segundos), estagnação (`stagnation`
+    gerações sem o melhor fitness subir mais que `epsilon`) e fitness alvo
+    (`target`). `cancel`, se informado, é um callable consultado a cada
+    geração para interromper a execução de fora (por exemplo, um job em
+    segundo plano). `check` devolve o motivo da parada ou None.
+    """
+
+    REASONS = {
+        "ngen": "número de gerações atingido",
+        "max_time": "tempo máximo atingido",
+        "stagnation": "estagnação do melhor fitness",
+        "target": "fitness alvo atingido",
+        "cancelled": "execução cancelada",
+    }
+
+    def __init__(self, max_time=None, stagnation=None, epsilon=0.0, target=None, cancel=None):
+        self.cancel = cancel
+        self.max_time = max_time
+        self.stagnation = stagnation
+        self.epsilon = epsilon
+        self.target = target
+        self.start()
+
+    def start(self):
+        self.started = time.monotonic()
+        self.best = -math.inf
+        self.stale = 0
+
+    def check(self, best_fitness):
+        # A referência só sobe com uma melhora maior que epsilon; ganhos
+        # menores se acumulam até superá-la
+        if best_fitness > self.best + self.epsilon:
+            self.best = best_fitness
+            self.stale = 0
+        else:
+            self.stale += 1
+        if self.cancel is not None and self.cancel():
+            return "cancelled"
+        if self.target is not None and best_fitness >= self.target:
+            return "target"
+        if self.max_time is not None and time.monotonic() - self.started >= self.max_time:
+            return "max_time"
+        if self.stagnation and self.stale >= self.stagnation:
+            return "stagnation"
+        return None
+
+
+# Colunas do log com a instrumentação por fase (ver `PhaseProfiler`)
+PHASE_FIELDS = ("t_select", "t_clone", "t_crossover", "t_mutation", "t_evaluate")
+DIVERSITY_FIELDS = ("invalid", "unique", "hamming")
+
+
+def diversity(population):
+    """
+    Número de genomas distintos e distância de Hamming média entre todos os
+    pares da população, calculada coluna a coluna sobre a matriz ordenada
+    (pares iguais em cada oferta), sem comparar os pares um a um.
+    """
+    genes = genome_matrix(population)
+    n, n_ofertas = genes.shape
+    unique = len({row.tobytes() for row in genes})
+    if n < 2:
+        return unique, 0.0
+    ordenado = np.sort(genes, axis=0)
+    novo = np.ones_like(ordenado, dtype=bool)
+    novo[1:] = ordenado[1:] != ordenado[:-1]
+    pos = np.arange(n)[:, np.newaxis]
+    inicio = np.maximum.accumulate(np.where(novo, pos, 0), axis=0)
+    iguais = float((pos - inicio).sum())
+    return unique, n_ofertas - iguais / (n * (n - 1) / 2)
+
+
+class PhaseProfiler:
+    """
+    Instrumentação opcional dos laços evolutivos: segundos gastos em cada
+    fase (seleção, clonagem, crossover, mutação, avaliação), indivíduos
+    inválidos avaliados e diversidade da população, por geração. Os laços
+    só usam estas versões cronometradas da variação quando recebem um
+    profiler; sem ele rodam `varAnd`/`varOr` do DEAP, sem custo extra.
+    """
+
+    def __init__(self):
+        self._reset()
+
+    def _reset(self):
+        self.tempos = dict.fromkeys(PHASE_FIELDS, 0.0)
+        self.invalid = 0
+
+    def select(self, toolbox, individuals, k):
+        t = time.perf_counter()
+        chosen = toolbox.select(individuals, k)
+        self.tempos["t_select"] += time.perf_counter() - t
+        return chosen
+
+    def clone(self, toolbox, individuals):
+        t = time.perf_counter()
+        clones = [toolbox.clone(ind) for ind in individuals]
+        self.tempos["t_clone"] += time.perf_counter() - t
+        return clones
+
+    def var_and(self, population, toolbox, cxpb, mutpb):
+        """`algorithms.varAnd` com a clonagem, o crossover e a mutação cronometrados."""
+        offspring = self.clone(toolbox, population)
+
+        t = time.perf_counter()
+        for i in range(1, len(offspring), 2):
+            if random.random() < cxpb:
+                offspring[i - 1], offspring[i] = toolbox.mate(offspring[i - 1], offspring[i])
+                del offspring[i - 1].fitness.values, offspring[i].fitness.values
+        t_mut = time.perf_counter()
+        for i in range(len(offspring)):
+            if random.random() < mutpb:
+                offspring[i], = toolbox.mutate(offspring[i])
+                del offspring[i].fitness.values
+        fim = time.perf_counter()
+
+        self.tempos["t_crossover"] += t_mut - t
+        self.tempos["t_mutation"] += fim - t_mut
+        return offspring
+
+    def var_or(self, population, toolbox, lambda_, cxpb, mutpb):
+        """`algorithms.varOr` com a clonagem, o crossover e a mutação cronometrados."""
+        offspring = []
+        for _ in range(lambda_):
+            op = random.random()
+            if op < cxpb:
+                ind1, ind2 = self.clone(toolbox, random.sample(population, 2))
+                t = time.perf_counter()
+                ind1, ind2 = toolbox.mate(ind1, ind2)
+                del ind1.fitness.values
+                self.tempos["t_crossover"] += time.perf_counter() - t
+                offspring.append(ind1)
+            elif op < cxpb + mutpb:
+                ind, = self.clone(toolbox, [random.choice(population)])
+                t = time.perf_counter()
+                ind, = toolbox.mutate(ind)
+                del ind.fitness.values
+                self.tempos["t_mutation"] += time.perf_counter() - t
+                offspring.append(ind)
+            else:
+                offspring.extend(self.clone(toolbox, [random.choice(population)]))
+        return offspring
+
+    def evaluate(self, population, toolbox, cache):
+        self.invalid += sum(1 for ind in population if not ind.fitness.valid)
+        t = time.perf_counter()
+        nevals = evaluate_invalid(population, toolbox, cache)
+        self.tempos["t_evaluate"] += time.perf_counter() - t
+        return nevals
+
+    def record(self, population):
+        """Colunas da geração para o log; zera os acumuladores."""
+        unique, hamming = diversity(population)
+        record = {k: round(v, 6) for k, v in self.tempos.items()}
+        record.update(invalid=self.invalid, unique=unique, hamming=round(hamming, 3))
+        self._reset()
+        return record
+
+
+def _best_fitness(population):
+    return max(ind.fitness.values[0] for ind in population)
+
+
+def _new_log(population, toolbox, stats, cache, verbose, callback, profiler=None):
+    """Cria o Logbook e registra a geração 0 (população inicial avaliada)."""
+    log = tools.Logbook()
+    log.header = ['gen', 'nevals'] + (stats.fields if stats else [])
+    if cache is not None:
+        log.header += ['cache_hit', 'cache_kb']
+    if hasattr(toolbox, "counts"):
+        log.header += list(OPERATOR_FIELDS)
+    if profiler is not None:
+        log.header += list(PHASE_FIELDS + DIVERSITY_FIELDS)
+        nevals = profiler.evaluate(population, toolbox, cache)
+    else:
+        nevals = evaluate_invalid(population, toolbox, cache)
+    _record(log, 0, nevals, population, toolbox, stats, cache, verbose, callback, profiler)
+    return log
+
+
+def _record(log, gen, nevals, population, toolbox, stats, cache, verbose, callback, profiler=None):
+    record = stats.compile(population) if stats else {}
+    if profiler is not None:
+        record.update(profiler.record(population))
+    log.record(gen=gen, nevals=nevals, **record, **_cache_record(cache), **_counts_record(toolbox))
+    if verbose:
+        print(log.stream)
+    if callback is not None:
+        callback(log[-1])
+
+
+def _initial_stop(log, population, stop):
+    """Checa alvo/cancelamento já na população inicial; devolve False se não deve evoluir."""
+    log.stop_reason = "ngen"
+    if stop is None:
+        return True
+    reason = stop.check(_best_fitness(population))
+    if reason in ("target", "cancelled"):
+        log.stop_reason = reason
+        return False
+    return True
+
+
+def ea_simple(population, toolbox, cxpb, mutpb, ngen, stats=None, verbose=False, cache=None,
+              stop=None, callback=None, checkpoint=None, log=None, profiler=None):
+    """
+    Mesmo laço de `algorithms.eaSimple`, mas avaliando cada geração em lote
+    com `toolbox.evaluate_population` em vez de `map(evaluate, ...)`.
+    Com `cache` (`FitnessCache`), o log ganha a taxa de acerto e o tamanho do cache;
+    com `toolbox.counts`, as aplicações de cada operador na geração.
+    Com `stop` (`StoppingCriteria`) o laço pode parar antes de `ngen`; o motivo
+    fica em `log.stop_reason`. `callback` recebe o registro de cada geração e
+    `checkpoint` (`checkpoint.Checkpointer`) a população e o log, também ao final.
+    Passando o `log` de um checkpoint, a execução continua da geração seguinte
+    à última registrada, com a população já avaliada.
+    Com `profiler` (`PhaseProfiler`), o log ganha o tempo de cada fase e a
+    diversidade da população em cada geração.
+    """
+    if stop is not None:
+        stop.start()
+    if log is None:
+        log = _new_log(population, toolbox, stats, cache, verbose, callback, profiler)
+    if not _initial_stop(log, population, stop):
+        ngen = 0
+
+    for gen in range(log[-1]['gen'] + 1, ngen + 1):
+        if profiler is None:
+            offspring = toolbox.select(population, len(population))
+            offspring = algorithms.varAnd(offspring, toolbox, cxpb, mutpb)
+            nevals = evaluate_invalid(offspring, toolbox, cache)
+        else:
+            offspring = profiler.select(toolbox, population, len(population))
+            offspring = profiler.var_and(offspring, toolbox, cxpb, mutpb)
+            nevals = profiler.evaluate(offspring, toolbox, cache)
+        population[:] = offspring
+        _record(log, gen, nevals, population, toolbox, stats, cache, verbose, callback, profiler)
+
+        if stop is not None:
+            reason = stop.check(_best_fitness(population))
+            if reason is not None:
+                log.stop_reason = reason
+                break
+        if checkpoint is not None:
+            checkpoint(population, log)
+
+    if checkpoint is not None:
+        checkpoint.save(population, log)
+    return population, log
+
+
+def ea_mu_lambda(population, toolbox, mu, lambda_, cxpb, mutpb, ngen, plus=True, stats=None,
+                 verbose=False, cache=None, stop=None, callback=None, checkpoint=None, log=None,
+                 profiler=None):
+    """
+    Laços de `algorithms.eaMuPlusLambda` (`plus=True`: os `mu` sobreviventes
+    saem de pais + filhos) e `eaMuCommaLambda` (`plus=False`: só dos `lambda_`
+    filhos), com a mesma avaliação em lote, cache, parada, callback e
+    checkpoint e instrumentação de `ea_simple`.
+    """
+    if stop is not None:
+        stop.start()
+    if log is None:
+        log = _new_log(population, toolbox, stats, cache, verbose, callback, profiler)
+    if not _initial_stop(log, population, stop):
+        ngen = 0
+
+    for gen in range(log[-1]['gen'] + 1, ngen + 1):
+        candidatos = population if plus else []
+        if profiler is None:
+            offspring = algorithms.varOr(population, toolbox, lambda_, cxpb, mutpb)
+            nevals = evaluate_invalid(offspring, toolbox, cache)
+            population[:] = toolbox.select(candidatos + offspring, mu)
+        else:
+            offspring = profiler.var_or(population, toolbox, lambda_, cxpb, mutpb)
+            nevals = profiler.evaluate(offspring, toolbox, cache)
+            population[:] = profiler.select(toolbox, candidatos + offspring, mu)
+        _record(log, gen, nevals, population, toolbox, stats, cache, verbose, callback, profiler)
+
+        if stop is not None:
+            reason = stop.check(_best_fitness(population))
+            if reason is not None:
+                log.stop_reason = reason
+                break
+        if checkpoint is not None:
+            checkpoint(population, log)
+
+    if checkpoint is not None:
+        checkpoint.save(population, log)
+    return population, log
+
+
+# Estado de cada processo do modelo de ilhas, montado uma vez na inicialização
+_island_toolbox = None
+_island_cache = None
+
+
+def _init_island_worker(problem, options, cache_size):
+    global _island_toolbox, _island_cache
+    _init_worker(problem)
+    _island_toolbox = setup_representation(problem, **options)[0]
+    _island_cache = FitnessCache(cache_size)
+
+
+def _island_epoch(args):
+    """
+    Evolui uma ilha por `ngen` gerações; cria a população se `population` for None.
+    Com `instrument`, os registros trazem as colunas de `PhaseProfiler`.
+    """
+    population, pop_size, ngen, cxpb, mutpb, seed, instrument = args
+    random.seed(seed)
+    if population is None:
+        population = _island_toolbox.population(n=pop_size)
+    population, log = ea_simple(
+        population, _island_toolbox, cxpb, mutpb, ngen,
+        stats=fitness_stats(), cache=_island_cache,
+        profiler=PhaseProfiler() if instrument else None
+    )
+    return population, list(log)
+
+
+def _migrate(islands, migrants, topology):
+    """Os `migrants` melhores de cada ilha substituem os piores da ilha de destino."""
+    k = len(islands)
+    if k < 2 or migrants <= 0:
+        return
+    if topology == "ring":
+        destinos = [(i + 1) % k for i in range(k)]
+    else:
+        destinos = [random.choice([j for j in range(k) if j != i]) for i in range(k)]
+    emigrantes = []
+    for pop in islands:
+        grupo = []
+        for src in tools.selBest(pop, migrants):
+            ind = creator.Individual(src)
+            ind.fitness.values = src.fitness.values
+            grupo.append(ind)
+        emigrantes.append(grupo)
+    for origem, destino in enumerate(destinos):
+        pop = islands[destino]
+        piores = sorted(range(len(pop)), key=lambda i: pop[i].fitness.values[0])[:migrants]
+        for i, ind in zip(piores, emigrantes[origem]):
+            pop[i] = ind
+
+
+def _merge_records(gen, records):
+    """
+    Junta os registros das ilhas de uma mesma geração em uma linha do log
+    global. Na instrumentação, tempos, inválidos e genomas distintos são
+    somados entre as ilhas e a distância de Hamming é a média das ilhas.
+    """
+    merged = {
+        "gen": gen,
+        "nevals": sum(r["nevals"] for r in records),
+        "avg": sum(r["avg"] for r in records) / len(records),
+        "min": min(r["min"] for r in records),
+        "max": max(r["max"] for r in records),
+    }
+    if PHASE_FIELDS[0] in records[0]:
+        for campo in PHASE_FIELDS:
+            merged[campo] = round(sum(r[campo] for r in records), 6)
+        merged["invalid"] = sum(r["invalid"] for r in records)
+        merged["unique"] = sum(r["unique"] for r in records)
+        merged["hamming"] = round(sum(r["hamming"] for r in records) / len(records), 3)
+    return merged
+
+
+def run_islands(semestre_nome, ngen=50, pop_size=100, cxpb=0.7, mutpb=0.2, problem=None,
+                n_islands=None, migration_interval=10, migrants=2, topology="ring",
+                cache_size=50_000, seed_fraction=0.0, mutation="reassign", repair_cx=False,
+                max_time=None, stagnation=None, epsilon=0.0, target=None, callback=None, cancel=None,
+                instrument=False):
+    """
+    Modelo de ilhas: `n_islands` subpopulações de `pop_size` indivíduos, cada
+    uma evoluindo em um processo com o toolbox de `setup_representation`.
+    A cada `migration_interval` gerações os `migrants` melhores de cada ilha
+    migram para outra (topologia `ring` ou `random`), substituindo os piores.
+    Retorna o melhor indivíduo global e um Logbook único com as ilhas agregadas.
+    Os critérios de parada (e `cancel`) são avaliados ao fim de cada época
+    de migração; `callback` recebe cada registro do log global.
+    `instrument=True` acrescenta ao log as colunas de `PhaseProfiler`
+    agregadas entre as ilhas (ver `_merge_records`).
+    """
+    if topology not in ("ring", "random"):
+        raise ValueError(f"Topologia desconhecida: {topology!r}")
+    if problem is None:
+        problem = build_problem(semestre_nome)
+    n_islands = n_islands or multiprocessing.cpu_count()
+    options = dict(seed_fraction=seed_fraction, mutation=mutation, repair_cx=repair_cx)
+
+    random.seed()
+    stop = StoppingCriteria(max_time, stagnation, epsilon, target, cancel)
+    log = tools.Logbook()
+    log.header = ["gen", "nevals", "avg", "min", "max"]
+    if instrument:
+        log.header += list(PHASE_FIELDS + DIVERSITY_FIELDS)
+    log.stop_reason = "ngen"
+    islands = [None] * n_islands
+
+    ctx = multiprocessing.get_context("spawn")
+    with ctx.Pool(n_islands, initializer=_init_island_worker,
+                  initargs=(problem, options, cache_size)) as pool:
+        gen = 0
+        while gen < ngen:
+            epoch = min(migration_interval, ngen - gen)
+            tasks = [
+                (pop, pop_size, epoch, cxpb, mutpb, random.getrandbits(64), instrument)
+                for pop in islands
+            ]
+            results = pool.map(_island_epoch, tasks)
+            islands = [pop for pop, _ in results]
+            logs = [records for _, records in results]
+
+            # A geração 0 de cada época repete a última da anterior
+            first = 0 if gen == 0 else 1
+            for offset in range(first, epoch + 1):
+                log.record(**_merge_records(gen + offset, [records[offset] for records in logs]))
+                if callback is not None:
+                    callback(log[-1])
+                reason = stop.check(log[-1]["max"])
+                if reason is not None and log.stop_reason == "ngen":
+                    log.stop_reason = reason
+            gen += epoch
+            if log.stop_reason != "ngen":
+                break
+            _migrate(islands, migrants, topology)
+
+    best = tools.selBest([ind for pop in islands for ind in pop], 1)[0]
     return best, log
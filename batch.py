@@ -0,0 +1,173 @@
+import multiprocessing
+from dataclasses import dataclass, field, replace
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+import numpy as np
+from sqlalchemy import func
+
+from ag import professor_select, pending_ofertas_select
+from db import session_scope, Oferta, SemestreLetivo, Disciplina, Alocacao
+from problem import ProblemInstance
+from competence import get_competence_index
+from solvers import solve
+
+
+@dataclass
+class BatchResult:
+    """
+    Resultado do modo em lote: um `SolverResult` e o `ProblemInstance`
+    resolvido (com a carga compartilhada do grupo, se houver) por semestre.
+    """
+
+    results: dict
+    problems: dict
+    # Semestres que compartilharam a carga dos professores (resolvidos em sequência)
+    groups: list = field(default_factory=list)
+
+
+def load_batch(semestre_nomes):
+    """
+    Carrega vários semestres de uma vez, em consultas Core: professores,
+    ofertas pendentes de todos os semestres (uma única consulta), carga já
+    alocada por semestre e o período de cada um. Devolve (professores,
+    {semestre: [tuplas de oferta]}, {semestre: {professor_id: horas}},
+    {semestre: (data_inicio, data_fim)}), no formato de `ProblemInstance.from_rows`.
+    """
+    with session_scope() as session:
+        professores = session.execute(professor_select()).all()
+        rows = session.execute(
+            pending_ofertas_select(SemestreLetivo.nome).where(SemestreLetivo.nome.in_(semestre_nomes))
+        ).all()
+        cargas = (
+            session.query(SemestreLetivo.nome, Alocacao.professor_id, func.sum(Disciplina.carga_horaria))
+                   .join(Oferta, Alocacao.oferta_id == Oferta.id)
+                   .join(Disciplina, Oferta.disciplina_id == Disciplina.id)
+                   .join(SemestreLetivo, Oferta.semestre_id == SemestreLetivo.id)
+                   .filter(SemestreLetivo.nome.in_(semestre_nomes))
+                   .group_by(SemestreLetivo.nome, Alocacao.professor_id)
+                   .all()
+        )
+        periodos = dict(
+            (nome, (inicio, fim))
+            for nome, inicio, fim in session.query(
+                SemestreLetivo.nome, SemestreLetivo.data_inicio, SemestreLetivo.data_fim
+            ).filter(SemestreLetivo.nome.in_(semestre_nomes))
+        )
+
+    ofertas = {nome: [] for nome in semestre_nomes}
+    for row in rows:
+        ofertas[row[-1]].append(row[:-1])
+    carga = {nome: {} for nome in semestre_nomes}
+    for nome, prof_id, horas in cargas:
+        carga[nome][prof_id] = float(horas)
+    return professores, ofertas, carga, periodos
+
+
+def overlap_groups(periodos):
+    """Agrupa os semestres cujos períodos se sobrepõem (direta ou transitivamente), em ordem de início."""
+    nomes = sorted(periodos, key=lambda n: (periodos[n][0], n))
+    grupos = []
+    fim_grupo = None
+    for nome in nomes:
+        inicio, fim = periodos[nome]
+        if grupos and inicio <= fim_grupo:
+            grupos[-1].append(nome)
+            fim_grupo = max(fim_grupo, fim)
+        else:
+            grupos.append([nome])
+            fim_grupo = fim
+    return grupos
+
+
+def build_batch(semestre_nomes, share_load=False):
+    """
+    Compila um `ProblemInstance` por semestre (todos com a mesma lista de
+    professores, na mesma ordem) e os grupos de resolução. Com `share_load`,
+    semestres sobrepostos formam um grupo e a carga já alocada em qualquer
+    um deles conta como carga existente de todos; sem ele, cada semestre é
+    um grupo isolado. Semestres sem ofertas pendentes ficam de fora.
+    """
+    professores, ofertas, carga, periodos = load_batch(semestre_nomes)
+    grupos = overlap_groups(periodos) if share_load else [[n] for n in semestre_nomes if n in periodos]
+
+    index = get_competence_index()
+    problems = {}
+    for grupo in grupos:
+        existente = {}
+        for nome in grupo:
+            for prof_id, horas in carga[nome].items():
+                existente[prof_id] = existente.get(prof_id, 0.0) + horas
+        for nome in grupo:
+            if ofertas[nome]:
+                problems[nome] = ProblemInstance.from_rows(
+                    professores, ofertas[nome], index, existente if share_load else carga[nome]
+                )
+    grupos = [[n for n in grupo if n in problems] for grupo in grupos]
+    return problems, [g for g in grupos if g]
+
+
+def _solve_group(grupo, problems, engine, params):
+    """
+    Resolve os semestres de um grupo em sequência; a carga alocada em cada
+    um entra como carga existente dos seguintes (professores alinhados).
+    Devolve os resultados e as instâncias efetivamente resolvidas.
+    """
+    results, resolvidos = {}, {}
+    alocada = None
+    for nome in grupo:
+        problem = problems[nome]
+        if alocada is not None:
+            problem = replace(problem, carga_base=problem.carga_base + alocada)
+        res = solve(engine, nome, problem, **params)
+        results[nome], resolvidos[nome] = res, problem
+        carga = problem.carga_por_professor(np.frombuffer(res.best, dtype=np.intc))
+        alocada = carga if alocada is None else alocada + carga
+    return results, resolvidos
+
+
+def run_batch(problems, groups, engine="ea_simple", workers=None, callback=None, cancel=None, **params):
+    """
+    Resolve vários semestres com o motor `engine` do registro. Cada grupo de
+    `build_batch` vai para um processo do pool (grupos independentes rodam
+    em paralelo; dentro de um grupo a resolução é sequencial). `callback`
+    recebe um registro por semestre concluído e `cancel` descarta os grupos
+    ainda não iniciados.
+    """
+    workers = max(1, min(workers or multiprocessing.cpu_count(), len(groups)))
+    results, resolvidos = {}, {}
+
+    def concluir(parcial):
+        parcial, instancias = parcial
+        resolvidos.update(instancias)
+        for nome, res in parcial.items():
+            results[nome] = res
+            if callback is not None:
+                callback({
+                    "gen": len(results), "nevals": res.evaluations, "semestre": nome,
+                    "max": res.fitness, "avg": res.fitness, "min": res.fitness,
+                })
+
+    if workers == 1:
+        for grupo in groups:
+            if cancel is not None and cancel():
+                break
+            concluir(_solve_group(grupo, problems, engine, params))
+        return BatchResult(results, resolvidos, groups)
+
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(workers, mp_context=ctx) as executor:
+        pendentes = {
+            executor.submit(_solve_group, grupo, {n: problems[n] for n in grupo}, engine, params)
+            for grupo in groups
+        }
+        while pendentes:
+            prontos, pendentes = wait(pendentes, timeout=1.0, return_when=FIRST_COMPLETED)
+            for futuro in prontos:
+                concluir(futuro.result())
+            if cancel is not None and cancel():
+                # Grupos já em execução terminam; os demais são descartados
+                for futuro in pendentes:
+                    futuro.cancel()
+                pendentes = {f for f in pendentes if not f.cancelled()}
+                cancel = None
+    return BatchResult(results, resolvidos, groups)
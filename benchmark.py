@@ -0,0 +1,323 @@
+"""
+Benchmark de desempenho do AG com instâncias sintéticas, sem banco de dados.
+
+Gera instâncias reprodutíveis (mesma semente, mesma instância) em várias
+escalas e mede, para cada uma: avaliações de fitness por segundo, tempo de
+parede do `run_ga`, pico de memória (tracemalloc) e fitness final. Os
+resultados vão para um arquivo JSON ou CSV que serve de baseline para
+comparar commits:
+
+    python benchmark.py --output benchmarks/baseline.json
+    python benchmark.py --compare benchmarks/baseline.json --tolerance 0.15
+
+Com `--compare`, o processo sai com código 1 se alguma métrica piorou além
+da tolerância. `--check-engines` só confere que todos os motores de
+`solvers.ENGINES` rodam com os parâmetros que a página do AG monta:
+
+    python benchmark.py --check-engines
+"""
+import os
+import io
+import csv
+import sys
+import json
+import time
+import argparse
+import platform
+import contextlib
+import subprocess
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+
+from ag import run_ga, evaluate_population, init_individual
+from problem import ProblemInstance
+from solvers import ENGINES, solve
+
+# Escalas padrão (professores x ofertas)
+SCALES = ((20, 50), (100, 400), (500, 2500), (2000, 10000))
+
+TITULACOES = ("Ensino Médio", "Graduado", "Especialista", "Mestre", "Doutor")
+
+# Métricas comparadas com o baseline: nome -> True se "maior é melhor"
+METRICS = {
+    "evals_per_sec": True,
+    "ga_seconds": False,
+    "peak_mb": False,
+}
+
+
+def synthetic_problem(n_profs, n_ofertas, n_areas=None, density=0.15, load_factor=0.7,
+                      base_fraction=0.0, seed=0):
+    """
+    Instância sintética reprodutível. Cada professor tem competência em cada
+    área com probabilidade `density` (e toda área tem ao menos um professor
+    competente); as cargas horárias são escolhidas para que a demanda total
+    seja `load_factor` da capacidade. `base_fraction` da capacidade de cada
+    professor já vem ocupada como carga existente do semestre.
+    """
+    rng = np.random.default_rng(seed)
+    n_areas = n_areas or max(1, min(n_profs, n_ofertas) // 5)
+
+    competencia = rng.random((n_profs, n_areas)) < density
+    sem_professor = np.flatnonzero(~competencia.any(axis=0))
+    competencia[rng.integers(n_profs, size=len(sem_professor)), sem_professor] = True
+
+    mensalista = rng.random(n_profs) < 0.5
+    carga_maxima = np.where(mensalista, 256.0, 128.0)
+    nivel = rng.integers(0, len(TITULACOES), size=n_profs).astype(np.int16)
+
+    media = load_factor * carga_maxima.sum() / n_ofertas
+    carga_horaria = np.maximum(10.0, np.round(media * rng.choice((0.5, 1.0, 1.5), size=n_ofertas) / 10) * 10)
+    disciplinas = np.arange(n_ofertas) // 2
+
+    return ProblemInstance(
+        professor_ids=np.arange(1, n_profs + 1, dtype=np.int64),
+        professor_nome=[f"Professor {i:05d}" for i in range(1, n_profs + 1)],
+        professor_titulacao=[TITULACOES[n] for n in nivel],
+        professor_modelo=["Mensalista " if m else "Horista" for m in mensalista],
+        prof_nivel=nivel,
+        carga_maxima=carga_maxima,
+        competencia=np.packbits(competencia, axis=1),
+        area_ids=np.arange(1, n_areas + 1, dtype=np.int64),
+        area_nome=[f"Área {a:04d}" for a in range(1, n_areas + 1)],
+        oferta_ids=np.arange(1, n_ofertas + 1, dtype=np.int64),
+        oferta_turma=["A" if j % 2 == 0 else "B" for j in range(n_ofertas)],
+        disciplina_ids=(disciplinas + 1).astype(np.int64),
+        disciplina_nome=[f"Disciplina {d + 1:05d}" for d in disciplinas],
+        oferta_area=rng.integers(n_areas, size=n_ofertas).astype(np.int32),
+        nivel_esperado=rng.integers(0, len(TITULACOES), size=n_ofertas).astype(np.int16),
+        carga_horaria=carga_horaria,
+        carga_base=np.round(base_fraction * carga_maxima),
+    )
+
+
+def bench_evaluate(problem, pop_size=100, repeat=5):
+    """Avaliações por segundo do kernel em lote, na melhor de `repeat` rodadas."""
+    population = [init_individual(problem) for _ in range(pop_size)]
+    evaluate_population(population, problem)
+    melhor = float("inf")
+    for _ in range(repeat):
+        t = time.perf_counter()
+        evaluate_population(population, problem)
+        melhor = min(melhor, time.perf_counter() - t)
+    return pop_size / melhor
+
+
+def _run_ga_quiet(problem, ngen, pop_size):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return run_ga("benchmark", ngen=ngen, pop_size=pop_size, problem=problem)
+
+
+def bench_run_ga(problem, ngen=20, pop_size=100, memory=True):
+    """
+    Tempo de parede e fitness final do `run_ga` (o AG é estocástico; só a
+    instância é reprodutível). O pico de memória é medido numa segunda
+    execução sob tracemalloc, para não distorcer o tempo.
+    """
+    t = time.perf_counter()
+    best, log = _run_ga_quiet(problem, ngen, pop_size)
+    resultado = {
+        "ga_seconds": time.perf_counter() - t,
+        "fitness": best.fitness.values[0],
+        "evaluations": int(sum(log.select("nevals"))),
+    }
+    if memory:
+        tracemalloc.start()
+        try:
+            _run_ga_quiet(problem, ngen, pop_size)
+            resultado["peak_mb"] = tracemalloc.get_traced_memory()[1] / 2**20
+        finally:
+            tracemalloc.stop()
+    return resultado
+
+
+# Mesmas chaves do dicionário de parâmetros de pages/ag_page.py, com valores pequenos
+CHECK_PARAMS = dict(
+    ngen=3, pop_size=10, cxpb=0.7, mutpb=0.2, seed_fraction=0.0, mutation="mixed", repair_cx=False,
+    stagnation=None, epsilon=0.0, instrument=False,
+    iters=500, t0=None, cooling="geometric", swap_prob=0.3, log_every=50,
+    max_time=None, target=None, lambda_=20, n_islands=2, migration_interval=2, migrants=1, topology="ring",
+    checkpoint_every=None, checkpoint_seconds=None, resume=None, warm_start=0.0, save_best_run=False,
+)
+
+
+def check_engines(problem, log=print):
+    """
+    Chama `solvers.solve` para cada motor registrado com `CHECK_PARAMS`, com
+    e sem instrumentação. Devolve a lista de (motor, erro) das que falharam.
+    """
+    falhas = []
+    for instrument in (False, True):
+        for engine in ENGINES:
+            try:
+                with contextlib.redirect_stdout(io.StringIO()):
+                    result = solve(engine, "benchmark", problem, **dict(CHECK_PARAMS, instrument=instrument))
+                log(f"{engine:>16}  instrument={instrument!s:<5}  fitness {result.fitness:,.1f}")
+            except Exception as e:
+                falhas.append((engine, e))
+                log(f"{engine:>16}  instrument={instrument!s:<5}  FALHOU: {e!r}")
+    return falhas
+
+
+def run_benchmark(scales=SCALES, n_areas=None, density=0.15, seed=0, ngen=20, pop_size=100,
+                  repeat=5, memory=True, log=print):
+    """Roda o benchmark em todas as escalas e devolve uma linha de resultados por escala."""
+    results = []
+    for n_profs, n_ofertas in scales:
+        problem = synthetic_problem(n_profs, n_ofertas, n_areas, density, seed=seed)
+        linha = {
+            "scale": f"{n_profs}x{n_ofertas}",
+            "professores": n_profs,
+            "ofertas": n_ofertas,
+            "areas": problem.n_areas,
+            "evals_per_sec": bench_evaluate(problem, pop_size, repeat),
+            **bench_run_ga(problem, ngen, pop_size, memory),
+        }
+        results.append(linha)
+        if log is not None:
+            log(_format_line(linha))
+    return results
+
+
+def _format_line(linha):
+    texto = (
+        f"{linha['scale']:>12}  {linha['evals_per_sec']:>12,.0f} aval/s  "
+        f"{linha['ga_seconds']:>8.2f} s  fitness {linha['fitness']:>14,.1f}"
+    )
+    if "peak_mb" in linha:
+        texto += f"  pico {linha['peak_mb']:>8.1f} MB"
+    return texto
+
+
+def _metadata(args):
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "params": args,
+    }
+
+
+def write_results(results, path, metadata=None):
+    """Grava os resultados em JSON (com metadados) ou CSV, conforme a extensão."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    if path.endswith(".csv"):
+        campos = list(dict.fromkeys(k for linha in results for k in linha))
+        with open(path, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=campos)
+            writer.writeheader()
+            writer.writerows(results)
+    else:
+        with open(path, "w") as f:
+            json.dump({"metadata": metadata or {}, "results": results}, f, indent=2)
+
+
+def read_results(path):
+    """Lê um baseline gravado por `write_results`."""
+    if path.endswith(".csv"):
+        with open(path, newline="") as f:
+            return [
+                {k: (v if k == "scale" else float(v)) for k, v in linha.items() if v != ""}
+                for linha in csv.DictReader(f)
+            ]
+    with open(path) as f:
+        return json.load(f)["results"]
+
+
+def compare_results(results, baseline, tolerance=0.10, min_seconds=0.05):
+    """
+    Compara com o baseline escala a escala. Devolve as linhas de comparação
+    e a lista de regressões (métricas que pioraram mais que `tolerance`).
+    Diferenças de tempo menores que `min_seconds` são tratadas como ruído.
+    """
+    base = {linha["scale"]: linha for linha in baseline}
+    linhas, regressoes = [], []
+    for linha in results:
+        anterior = base.get(linha["scale"])
+        if anterior is None:
+            continue
+        for metrica, maior_melhor in METRICS.items():
+            if metrica not in linha or metrica not in anterior or not anterior[metrica]:
+                continue
+            variacao = linha[metrica] / anterior[metrica] - 1.0
+            piorou = -variacao if maior_melhor else variacao
+            item = {
+                "scale": linha["scale"],
+                "metric": metrica,
+                "baseline": anterior[metrica],
+                "current": linha[metrica],
+                "change": variacao,
+                "regression": piorou > tolerance,
+            }
+            if metrica == "ga_seconds" and abs(linha[metrica] - anterior[metrica]) < min_seconds:
+                item["regression"] = False
+            linhas.append(item)
+            if item["regression"]:
+                regressoes.append(item)
+    return linhas, regressoes
+
+
+def _parse_scale(texto):
+    try:
+        n_profs, n_ofertas = (int(x) for x in texto.lower().split("x"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Escala inválida: {texto!r} (use PROFESSORESxOFERTAS)")
+    return n_profs, n_ofertas
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark do AG com instâncias sintéticas.")
+    parser.add_argument("--scales", nargs="+", type=_parse_scale, default=list(SCALES),
+                        help="escalas PROFESSORESxOFERTAS (padrão: %(default)s)")
+    parser.add_argument("--areas", type=int, default=None, help="número de áreas (padrão: min(P, N) / 5)")
+    parser.add_argument("--density", type=float, default=0.15, help="probabilidade de competência por área")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--ngen", type=int, default=20)
+    parser.add_argument("--pop-size", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=5, help="rodadas na medição de avaliações por segundo")
+    parser.add_argument("--no-memory", action="store_true", help="não mede o pico de memória")
+    parser.add_argument("--output", default=os.path.join("benchmarks", "baseline.json"),
+                        help="arquivo de saída .json ou .csv")
+    parser.add_argument("--compare", help="baseline anterior para comparar")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="piora relativa tolerada")
+    parser.add_argument("--check-engines", action="store_true",
+                        help="só roda cada motor uma vez com os parâmetros da página do AG")
+    args = parser.parse_args(argv)
+
+    if args.check_engines:
+        problem = synthetic_problem(20, 50, args.areas, args.density, seed=args.seed)
+        return 1 if check_engines(problem) else 0
+
+    results = run_benchmark(
+        args.scales, args.areas, args.density, args.seed, args.ngen, args.pop_size,
+        args.repeat, memory=not args.no_memory
+    )
+    params = {k: v for k, v in vars(args).items() if k not in ("output", "compare")}
+    write_results(results, args.output, _metadata(params))
+    print(f"Resultados gravados em {args.output}")
+
+    if args.compare:
+        linhas, regressoes = compare_results(results, read_results(args.compare), args.tolerance)
+        for item in linhas:
+            marca = "REGRESSÃO" if item["regression"] else ""
+            print(
+                f"{item['scale']:>12}  {item['metric']:<14} {item['baseline']:>14,.2f} -> "
+                f"{item['current']:>14,.2f}  ({item['change']:+.1%}) {marca}"
+            )
+        if regressoes:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
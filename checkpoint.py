@@ -0,0 +1,119 @@
+import os
+import re
+import glob
+import json
+import time
+import pickle
+import random
+from datetime import datetime
+
+import numpy as np
+
+from problem import genome_matrix
+
+# Diretório padrão dos checkpoints do AG
+CHECKPOINT_DIR = os.getenv("SIA_CHECKPOINT_DIR", "checkpoints")
+
+
+def new_run_id():
+    return datetime.now().strftime("%Y%m%d-%H%M%S")
+
+
+def checkpoint_path(directory, semestre_nome, run_id):
+    """Caminho do checkpoint de uma execução: <dir>/<semestre>/<run_id>.ckpt."""
+    semestre = re.sub(r"[^\w.-]", "_", semestre_nome)
+    return os.path.join(directory, semestre, f"{run_id}.ckpt")
+
+
+def latest_checkpoint(semestre_nome, directory=CHECKPOINT_DIR):
+    """Checkpoint mais recente do semestre, ou None."""
+    pasta = os.path.dirname(checkpoint_path(directory, semestre_nome, "x"))
+    arquivos = glob.glob(os.path.join(pasta, "*.ckpt"))
+    return max(arquivos, key=os.path.getmtime) if arquivos else None
+
+
+def best_path(semestre_nome, directory=CHECKPOINT_DIR):
+    return checkpoint_path(directory, semestre_nome, "best").replace(".ckpt", ".json")
+
+
+def save_best(semestre_nome, problem, best, directory=CHECKPOINT_DIR):
+    """Guarda o melhor genoma da execução como {oferta_id: professor_id}, para warm start."""
+    genes = np.frombuffer(best, dtype=np.intc)
+    alocacao = {
+        str(int(oid)): int(problem.professor_ids[g])
+        for oid, g in zip(problem.oferta_ids, genes)
+    }
+    path = best_path(semestre_nome, directory)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump({"fitness": best.fitness.values[0], "alocacao": alocacao}, f)
+    os.replace(tmp, path)
+
+
+def load_best(semestre_nome, directory=CHECKPOINT_DIR):
+    """Melhor alocação salva do semestre como {oferta_id: professor_id}, ou {}."""
+    path = best_path(semestre_nome, directory)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return {int(k): v for k, v in json.load(f)["alocacao"].items()}
+
+
+def save_checkpoint(path, problem, population, log, params=None):
+    """
+    Grava atomicamente um snapshot da execução: população como matriz int32,
+    fitness, Logbook, estado do `random`, os ids do problema para validar a
+    retomada e as configurações da execução (`params`) para restaurá-las.
+    """
+    state = {
+        "genes": genome_matrix(population).astype(np.int32),
+        "fitness": np.array([ind.fitness.values[0] for ind in population]),
+        "log": log,
+        "gen": log[-1]["gen"],
+        "rng": random.getstate(),
+        "professor_ids": problem.professor_ids,
+        "oferta_ids": problem.oferta_ids,
+        "params": params or {},
+    }
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, path)
+
+
+def load_checkpoint(path, problem):
+    """Lê um checkpoint e confere se ele foi gerado para os mesmos professores e ofertas."""
+    with open(path, "rb") as f:
+        state = pickle.load(f)
+    if (not np.array_equal(state["professor_ids"], problem.professor_ids)
+            or not np.array_equal(state["oferta_ids"], problem.oferta_ids)):
+        raise ValueError(
+            "O checkpoint não corresponde aos dados atuais do semestre "
+            "(professores ou ofertas pendentes mudaram)."
+        )
+    return state
+
+
+class Checkpointer:
+    """Salva a execução a cada `every` gerações e/ou a cada `seconds` segundos."""
+
+    def __init__(self, path, problem, every=None, seconds=None, params=None):
+        self.path = path
+        self.problem = problem
+        self.every = every
+        self.seconds = seconds
+        self.params = params
+        self._last = time.monotonic()
+
+    def __call__(self, population, log):
+        gen = log[-1]["gen"]
+        due = bool(self.every) and gen % self.every == 0
+        due = due or (self.seconds is not None and time.monotonic() - self._last >= self.seconds)
+        if due:
+            self.save(population, log)
+
+    def save(self, population, log):
+        save_checkpoint(self.path, self.problem, population, log, self.params)
+        self._last = time.monotonic()
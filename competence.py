@@ -0,0 +1,122 @@
+import threading
+from dataclasses import dataclass
+
+import numpy as np
+from sqlalchemy import select
+
+from db import session_scope, data_version, prof_area, Professor, AreaCompetencia
+
+# Tabelas das quais o índice depende
+TABLES = (Professor.__tablename__, AreaCompetencia.__tablename__, prof_area.name)
+
+
+@dataclass
+class CompetenceIndex:
+    """
+    Índice de competências compartilhado pelo processo, montado a partir de
+    `professor_area_competencia`. Professores e áreas são remapeados para
+    posições densas (ordenadas por id):
+
+    - `por_area[a]`: posições dos professores competentes na área `a`, ordenadas;
+    - `mascara`: bitmatriz professor x área empacotada com np.packbits,
+      no mesmo formato de `ProblemInstance.competencia`.
+    """
+
+    professor_ids: np.ndarray
+    area_ids: np.ndarray
+    por_area: list
+    mascara: np.ndarray
+    version: tuple = ()
+
+    @classmethod
+    def from_pairs(cls, professor_ids, area_ids, pares, version=()):
+        """Monta o índice a partir das listas de ids e dos pares (professor_id, area_id)."""
+        professor_ids = np.asarray(professor_ids, dtype=np.int64)
+        area_ids = np.asarray(area_ids, dtype=np.int64)
+        pares = np.asarray(pares, dtype=np.int64).reshape(-1, 2)
+        prof = np.searchsorted(professor_ids, pares[:, 0])
+        area = np.searchsorted(area_ids, pares[:, 1])
+
+        matriz = np.zeros((len(professor_ids), len(area_ids)), dtype=bool)
+        matriz[prof, area] = True
+        # Ordena por (área, professor) e corta em um array por área
+        ordem = np.lexsort((prof, area))
+        limites = np.searchsorted(area[ordem], np.arange(len(area_ids) + 1))
+        profs = prof[ordem].astype(np.intc)
+        por_area = [profs[limites[a]:limites[a + 1]] for a in range(len(area_ids))]
+        return cls(professor_ids, area_ids, por_area, np.packbits(matriz, axis=1), version)
+
+    def _posicoes(self, ids, universo):
+        ids = np.asarray(ids, dtype=np.int64)
+        pos = np.searchsorted(universo, ids)
+        pos[pos == len(universo)] = 0
+        return pos, universo[pos] == ids if len(universo) else np.zeros(len(ids), dtype=bool)
+
+    def competentes(self, professor_ids, area_ids):
+        """
+        Para cada área de `area_ids`, as posições em `professor_ids` dos
+        professores competentes nela, em ordem crescente, recortadas de
+        `por_area` sem percorrer a bitmatriz.
+        """
+        professor_ids = np.asarray(professor_ids, dtype=np.int64)
+        p, p_ok = self._posicoes(professor_ids, self.professor_ids)
+        mapa = np.full(len(self.professor_ids), -1, dtype=np.intc)
+        mapa[p[p_ok]] = np.flatnonzero(p_ok)
+        a, a_ok = self._posicoes(area_ids, self.area_ids)
+        vazio = np.empty(0, dtype=np.intc)
+        resultado = []
+        for pos, ok in zip(a.tolist(), a_ok.tolist()):
+            if not ok:
+                resultado.append(vazio)
+                continue
+            cands = mapa[self.por_area[pos]]
+            resultado.append(np.sort(cands[cands >= 0]))
+        return resultado
+
+    def areas_sem_professor(self, area_ids):
+        """Dentre `area_ids`, os que não têm nenhum professor competente."""
+        area_ids = np.asarray(area_ids, dtype=np.int64)
+        pos, ok = self._posicoes(area_ids, self.area_ids)
+        tamanhos = np.array([len(c) for c in self.por_area], dtype=np.int64)
+        cobertas = ok & (tamanhos[pos] > 0) if len(tamanhos) else ok
+        return area_ids[~cobertas]
+
+    def matriz(self, professor_ids, area_ids):
+        """
+        Bitmatriz empacotada restrita aos professores e áreas pedidos, na
+        ordem dada (linhas e colunas de ids desconhecidos ficam zeradas).
+        """
+        p, p_ok = self._posicoes(professor_ids, self.professor_ids)
+        a, a_ok = self._posicoes(area_ids, self.area_ids)
+        bits = np.unpackbits(self.mascara[p], axis=1, count=len(self.area_ids))[:, a].astype(bool)
+        bits &= p_ok[:, np.newaxis] & a_ok[np.newaxis, :]
+        return np.packbits(bits, axis=1)
+
+
+def load_competence_index():
+    """Lê professores, áreas e pares de competência (três consultas Core) e monta o índice."""
+    version = data_version(*TABLES)
+    with session_scope() as session:
+        professor_ids = session.execute(select(Professor.id).order_by(Professor.id)).scalars().all()
+        area_ids = session.execute(select(AreaCompetencia.id).order_by(AreaCompetencia.id)).scalars().all()
+        pares = session.execute(
+            select(prof_area.c.professor_id, prof_area.c.area_id)
+            .order_by(prof_area.c.area_id, prof_area.c.professor_id)
+        ).all()
+    return CompetenceIndex.from_pairs(professor_ids, area_ids, pares, version)
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_competence_index():
+    """
+    Índice de competências do processo, recompilado só quando professores,
+    áreas ou competências mudam (ver `db.data_version`).
+    """
+    global _index
+    with _index_lock:
+        if _index is None or _index.version != data_version(*TABLES):
+            _index = load_competence_index()
+        return _index
@@ -1,13 +1,19 @@
 import os
 import enum
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from itertools import chain
 import streamlit as st
 from sqlalchemy import (
     create_engine, Column, Integer, String,
     Numeric, Date, ForeignKey, Table,
-    Enum, CheckConstraint, UniqueConstraint, Index
+    Enum, CheckConstraint, UniqueConstraint, Index,
+    event, inspect, text
 )
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import relationship, sessionmaker
+from sqlalchemy.orm import relationship, sessionmaker, scoped_session, Session
 
 # ---------------------------------------------------------------------
 # 1. Conexão e Sessão
@@ -16,14 +22,52 @@ DATABASE_URL = os.getenv(
     'DATABASE_URL'
 )
 
+# Pool de conexões (configurável por variáveis de ambiente)
+DB_POOL_SIZE      = int(os.getenv('DB_POOL_SIZE', '10'))
+DB_MAX_OVERFLOW   = int(os.getenv('DB_MAX_OVERFLOW', '20'))
+DB_POOL_PRE_PING  = os.getenv('DB_POOL_PRE_PING', '1').lower() not in ('0', 'false', 'no')
+DB_POOL_RECYCLE   = int(os.getenv('DB_POOL_RECYCLE', '1800'))   # segundos; -1 = nunca
+DB_POOL_TIMEOUT   = int(os.getenv('DB_POOL_TIMEOUT', '30'))
+
 @st.cache_resource
 def get_engine():
-    return create_engine(DATABASE_URL, echo=False)
+    return create_engine(
+        DATABASE_URL,
+        echo=False,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_pre_ping=DB_POOL_PRE_PING,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_timeout=DB_POOL_TIMEOUT,
+    )
 
 @st.cache_resource
-def get_session():
-    SessionLocal = sessionmaker(bind=get_engine())
-    return SessionLocal()
+def get_session_factory():
+    """
+    Fábrica de sessões com escopo por thread: cada execução do script do
+    Streamlit e cada thread de job tem a sua `Session`, sobre o mesmo engine.
+    """
+    return scoped_session(sessionmaker(bind=get_engine()))
+
+@contextmanager
+def session_scope():
+    """
+    Sessão da thread atual, liberada ao sair do bloco (a conexão volta ao
+    pool e o mapa de identidade é descartado). Commits continuam explícitos;
+    uma exceção desfaz a transação pendente. Blocos aninhados na mesma thread
+    reaproveitam a sessão do bloco externo, que é quem a libera.
+    """
+    factory = get_session_factory()
+    aninhado = factory.registry.has()
+    session = factory()
+    try:
+        yield session
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        if not aninhado:
+            factory.remove()
 
 # ---------------------------------------------------------------------
 # 2. Base ORM
@@ -130,6 +174,10 @@ class Oferta(Base):
 
 class Alocacao(Base):
     __tablename__ = 'alocacao'
+    __table_args__ = (
+        # Uma alocação por oferta: base do INSERT ... ON CONFLICT (oferta_id) DO NOTHING
+        Index('uq_alocacao_oferta_id', 'oferta_id', unique=True),
+    )
 
     id           = Column(Integer, primary_key=True)
     oferta_id    = Column(Integer, ForeignKey('oferta.id', ondelete='CASCADE'), nullable=False)
@@ -139,8 +187,113 @@ class Alocacao(Base):
     professor = relationship('Professor', back_populates='alocacoes')
 
 # ---------------------------------------------------------------------
-# 6. Inicialização do banco
+# 6. Versão dos dados
+# ---------------------------------------------------------------------
+# Contador por tabela, incrementado a cada commit que altera linhas dela.
+# Caches derivados do banco (ex.: `competence.get_competence_index`) guardam
+# a versão das tabelas de que dependem e se recompilam quando ela muda.
+_versions = Counter()
+_versions_lock = threading.Lock()
+
+
+def _cascade_dependents():
+    """Tabelas afetadas por um DELETE em cada tabela (ON DELETE CASCADE, transitivo)."""
+    diretos = {}
+    for tabela in Base.metadata.sorted_tables:
+        for fk in tabela.foreign_keys:
+            if (fk.ondelete or "").upper() == "CASCADE":
+                diretos.setdefault(fk.column.table.name, set()).add(tabela.name)
+    dependentes = {}
+    for nome in diretos:
+        vistos, pilha = set(), [nome]
+        while pilha:
+            for filho in diretos.get(pilha.pop(), ()):
+                if filho not in vistos:
+                    vistos.add(filho)
+                    pilha.append(filho)
+        dependentes[nome] = vistos
+    return dependentes
+
+
+_CASCADE = _cascade_dependents()
+
+
+def data_version(*tabelas):
+    """Versão atual das tabelas pedidas (tupla comparável, uma entrada por tabela)."""
+    with _versions_lock:
+        return tuple(_versions[t] for t in tabelas)
+
+
+def invalidate_data(*tabelas):
+    """
+    Marca as tabelas como alteradas. Commits feitos por uma `Session` (flush
+    do ORM ou `session.execute` de INSERT/UPDATE/DELETE) são detectados
+    automaticamente; escritas por fora dela (conexão direta, outro processo)
+    devem chamar esta função.
+    """
+    with _versions_lock:
+        for tabela in tabelas:
+            _versions[tabela] += 1
+
+
+@event.listens_for(Session, "after_flush")
+def _track_changes(session, flush_context):
+    # Ainda no estado pré-flush: new/dirty/deleted listam o que foi gravado
+    alteradas = session.info.setdefault("tabelas_alteradas", set())
+    for obj in chain(session.new, session.dirty):
+        mapper = inspect(obj).mapper
+        alteradas.add(mapper.local_table.name)
+        # Coleções N:N (ex.: Professor.areas) gravam na tabela associativa
+        alteradas.update(r.secondary.name for r in mapper.relationships if r.secondary is not None)
+    for obj in session.deleted:
+        mapper = inspect(obj).mapper
+        alteradas.add(mapper.local_table.name)
+        alteradas.update(_CASCADE.get(mapper.local_table.name, ()))
+        alteradas.update(r.secondary.name for r in mapper.relationships if r.secondary is not None)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _track_statements(orm_execute_state):
+    # INSERT/UPDATE/DELETE em lote via `session.execute` não passam pelo flush
+    if not (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    tabela = orm_execute_state.statement.table.name
+    alteradas = orm_execute_state.session.info.setdefault("tabelas_alteradas", set())
+    alteradas.add(tabela)
+    if orm_execute_state.is_delete:
+        alteradas.update(_CASCADE.get(tabela, ()))
+
+
+@event.listens_for(Session, "after_commit")
+def _bump_versions(session):
+    alteradas = session.info.pop("tabelas_alteradas", None)
+    if alteradas:
+        invalidate_data(*alteradas)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_changes(session):
+    session.info.pop("tabelas_alteradas", None)
+
+
+# ---------------------------------------------------------------------
+# 7. Inicialização do banco
 # ---------------------------------------------------------------------
 def init_db():
-    """Cria as tabelas no banco se ainda não existirem."""
-    Base.metadata.create_all(bind=get_engine())
+    """
+    Cria as tabelas no banco se ainda não existirem. Em bancos criados antes
+    do índice único de `alocacao.oferta_id`, cria o índice; se houver ofertas
+    com mais de uma alocação, avisa (o índice só é criado depois de removê-las).
+    """
+    engine = get_engine()
+    Base.metadata.create_all(bind=engine)
+    try:
+        with engine.begin() as conn:
+            conn.execute(text(
+                "CREATE UNIQUE INDEX IF NOT EXISTS uq_alocacao_oferta_id ON alocacao (oferta_id)"
+            ))
+    except IntegrityError:
+        st.warning(
+            "Há ofertas com mais de uma alocação; remova as duplicatas para habilitar "
+            "a gravação em lote de alocações."
+        )
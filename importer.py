@@ -0,0 +1,244 @@
+from collections import Counter
+
+import pandas as pd
+from openpyxl import load_workbook
+from sqlalchemy import select, func, insert
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from db import AreaCompetencia, SemestreLetivo, Professor, Disciplina, Oferta, Alocacao, prof_area
+
+# Colunas da planilha usadas na importação
+COLUMNS = (
+    "PERIODO_LETIVO", "DT INCIO DISCIPLINA", "DT FIM DISCIPLINA", "DISCIPLINA", "CH_DISCIPLINA",
+    "PROFESSOR", "TITULACAO_PROFESSOR", "nivel_professor", "nivel_esperado", "area_competencia",
+    "Horas Máximas Sala/Semestre", "Modelo de Contratação",
+)
+DATE_COLUMNS = ("DT INCIO DISCIPLINA", "DT FIM DISCIPLINA")
+
+
+# Linhas por parte na leitura em streaming
+CHUNK_SIZE = 5_000
+
+
+def prepare_frame(df):
+    """Converte as colunas de data da planilha (dd/mm/aaaa) para datetime."""
+    for col in DATE_COLUMNS:
+        df[col] = pd.to_datetime(df[col], dayfirst=True, errors="coerce")
+    return df
+
+
+class ExcelStream:
+    """
+    Leitura em streaming da primeira planilha do arquivo: openpyxl em modo
+    read-only, só com as colunas de `COLUMNS`, em DataFrames de até
+    `chunk_size` linhas (memória limitada pelo tamanho da parte, não do
+    arquivo). `total` é o número de linhas declarado na planilha (pode ser
+    None) e `rows` o de linhas já lidas.
+    """
+
+    def __init__(self, file, chunk_size=CHUNK_SIZE):
+        self.chunk_size = chunk_size
+        self._wb = load_workbook(file, read_only=True, data_only=True)
+        self._ws = self._wb.worksheets[0]
+        self.total = self._ws.max_row - 1 if self._ws.max_row else None
+        self.rows = 0
+
+    def __iter__(self):
+        try:
+            linhas = self._ws.iter_rows(values_only=True)
+            cabecalho = next(linhas, ())
+            faltando = [c for c in COLUMNS if c not in cabecalho]
+            if faltando:
+                raise ValueError(f"Colunas ausentes na planilha: {', '.join(faltando)}")
+            indices = [cabecalho.index(c) for c in COLUMNS]
+            # Lê só até a última coluna usada
+            linhas = self._ws.iter_rows(min_row=2, max_col=max(indices) + 1, values_only=True)
+            parte = []
+            for linha in linhas:
+                if not any(linha):
+                    continue
+                parte.append([linha[i] if i < len(linha) else None for i in indices])
+                if len(parte) == self.chunk_size:
+                    yield self._frame(parte)
+                    parte = []
+            if parte:
+                yield self._frame(parte)
+        finally:
+            self._wb.close()
+
+    def _frame(self, parte):
+        df = pd.DataFrame(parte, columns=list(COLUMNS), index=range(self.rows, self.rows + len(parte)))
+        self.rows += len(parte)
+        return prepare_frame(df.infer_objects())
+
+
+class ImportPipeline:
+    """
+    Importação da planilha por conjuntos, na sessão `db` (a transação é de
+    quem chama). Os mapas nome -> id de cada tabela são lidos uma única vez;
+    a cada `process(df)` as linhas novas de cada entidade saem de diferenças
+    de conjuntos no pandas e são gravadas com um INSERT em lote por entidade,
+    na ordem de dependência, com os ids gerados lidos pelo RETURNING.
+    A planilha pode vir inteira ou em partes (ver `ExcelStream`): os mapas
+    valem entre chamadas e a primeira ocorrência de cada nome vence. Ofertas
+    e alocações cujo semestre ou oferta só aparece numa parte posterior ficam
+    pendentes até `finish()`.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self.stats = Counter()
+        self.areas = self._map(select(AreaCompetencia.nome, AreaCompetencia.id))
+        self.semestres = self._map(select(SemestreLetivo.nome, SemestreLetivo.id))
+        self.professores = self._map(select(Professor.nome, func.min(Professor.id)).group_by(Professor.nome))
+        self.disciplinas = self._map(select(Disciplina.nome, func.min(Disciplina.id)).group_by(Disciplina.nome))
+        self.ofertas = {
+            (sem, disc): oferta for sem, disc, oferta in db.execute(
+                select(Oferta.semestre_id, Oferta.disciplina_id, func.min(Oferta.id))
+                .group_by(Oferta.semestre_id, Oferta.disciplina_id)
+            )
+        }
+        self.prof_areas = set(db.execute(select(prof_area.c.professor_id, prof_area.c.area_id)).tuples())
+        self.alocadas = set(db.execute(select(Alocacao.oferta_id)).scalars())
+        self._pendentes_ofertas = []
+        self._pendentes_alocacoes = []
+
+    def _map(self, stmt):
+        return {nome: id_ for nome, id_ in self.db.execute(stmt)}
+
+    def _insert(self, tabela, rows, *returning):
+        """INSERT em lote (insertmanyvalues); devolve as colunas `returning` das linhas gravadas."""
+        if not rows:
+            return []
+        self.stats[tabela.name] += len(rows)
+        if not returning:
+            self.db.execute(insert(tabela), rows)
+            return []
+        return self.db.execute(insert(tabela).returning(*returning), rows).all()
+
+    def process(self, df):
+        """Importa um DataFrame com as colunas de `COLUMNS` (datas já convertidas)."""
+        self._areas(df)
+        self._semestres(df)
+        self._professores(df)
+        self._disciplinas(df)
+        self._ofertas(df)
+        self._alocacoes(df)
+
+    def finish(self):
+        """Reprocessa as ofertas e alocações pendentes das partes anteriores."""
+        if self._pendentes_ofertas:
+            self._ofertas(pd.concat(self._pendentes_ofertas), adiar=False)
+        if self._pendentes_alocacoes:
+            self._alocacoes(pd.concat(self._pendentes_alocacoes), adiar=False)
+        self._pendentes_ofertas, self._pendentes_alocacoes = [], []
+
+    # 1. Áreas de competência
+    def _areas(self, df):
+        nomes = pd.unique(df["area_competencia"].dropna())
+        novas = [{"nome": nome} for nome in nomes if nome not in self.areas]
+        t = AreaCompetencia.__table__
+        self.areas.update(self._insert(t, novas, t.c.nome, t.c.id))
+
+    # 2. Semestres (datas da primeira linha completa de cada um)
+    def _semestres(self, df):
+        sem = df[["PERIODO_LETIVO", "DT INCIO DISCIPLINA", "DT FIM DISCIPLINA"]].dropna()
+        sem = sem.drop_duplicates(subset=["PERIODO_LETIVO"])
+        sem = sem[~sem["PERIODO_LETIVO"].isin(self.semestres.keys())]
+        novos = [
+            {
+                "nome": nome, "ano": int(nome[:4]), "periodo": nome[4:],
+                "data_inicio": dt_i.date(), "data_fim": dt_f.date(),
+            }
+            for nome, dt_i, dt_f in sem.itertuples(index=False)
+        ]
+        t = SemestreLetivo.__table__
+        self.semestres.update(self._insert(t, novos, t.c.nome, t.c.id))
+
+    # 3. Professores (atributos da primeira linha de cada um) e suas áreas
+    def _professores(self, df):
+        prof = df[["PROFESSOR", "TITULACAO_PROFESSOR", "nivel_professor", "Modelo de Contratação"]]
+        prof = prof.dropna(subset=["PROFESSOR"]).drop_duplicates(subset=["PROFESSOR"])
+        prof = prof[~prof["PROFESSOR"].isin(self.professores.keys())]
+        novos = [
+            {
+                "nome": nome, "titulacao": titul, "nivel": int(nivel),
+                "carga_maxima": 256.0 if modelo == "Mensalista " else 128.0,
+                "modelo_contratacao": modelo,
+            }
+            for nome, titul, nivel, modelo in prof.itertuples(index=False)
+        ]
+        t = Professor.__table__
+        self.professores.update(self._insert(t, novos, t.c.nome, t.c.id))
+
+        pares = df[["PROFESSOR", "area_competencia"]].dropna().drop_duplicates()
+        pares = zip(pares["PROFESSOR"].map(self.professores), pares["area_competencia"].map(self.areas))
+        novos = {(int(p), int(a)) for p, a in pares if not pd.isna(p) and not pd.isna(a)} - self.prof_areas
+        self._insert(prof_area, [{"professor_id": p, "area_id": a} for p, a in sorted(novos)])
+        self.prof_areas |= novos
+
+    # 4. Disciplinas (uma única vez, pela primeira linha de cada nome)
+    def _disciplinas(self, df):
+        disc = df[["DISCIPLINA", "area_competencia", "CH_DISCIPLINA", "nivel_esperado"]]
+        disc = disc.dropna(subset=["DISCIPLINA"]).drop_duplicates(subset=["DISCIPLINA"])
+        disc = disc[~disc["DISCIPLINA"].isin(self.disciplinas.keys())]
+        novas = [
+            {
+                "nome": nome, "area_id": self.areas.get(area), "carga_horaria": float(carga),
+                "nivel_esperado": None if pd.isna(nivel) else int(nivel),
+            }
+            for nome, area, carga, nivel in disc.itertuples(index=False)
+        ]
+        t = Disciplina.__table__
+        self.disciplinas.update(self._insert(t, novas, t.c.nome, t.c.id))
+
+    def _chaves_oferta(self, df):
+        """(semestre_id, disciplina_id) de cada linha, descartando nomes não resolvidos."""
+        chaves = pd.DataFrame({
+            "semestre_id": df["PERIODO_LETIVO"].map(self.semestres),
+            "disciplina_id": df["DISCIPLINA"].map(self.disciplinas),
+        }, index=df.index).dropna()
+        return chaves.astype("int64")
+
+    # 5. Ofertas (uma por semestre e disciplina)
+    def _ofertas(self, df, adiar=True):
+        linhas = df[["PERIODO_LETIVO", "DISCIPLINA", "CH_DISCIPLINA"]].dropna()
+        chaves = self._chaves_oferta(linhas)
+        if adiar and len(chaves) < len(linhas):
+            self._pendentes_ofertas.append(linhas.drop(chaves.index))
+        chaves = chaves.drop_duplicates()
+        novas = [
+            {"semestre_id": sem, "disciplina_id": disc, "turma": None}
+            for sem, disc in chaves.itertuples(index=False, name=None)
+            if (sem, disc) not in self.ofertas
+        ]
+        t = Oferta.__table__
+        for id_, sem, disc in self._insert(t, novas, t.c.id, t.c.semestre_id, t.c.disciplina_id):
+            self.ofertas[(sem, disc)] = id_
+
+    # 6. Alocações: o primeiro professor de cada oferta ainda sem alocação
+    def _alocacoes(self, df, adiar=True):
+        linhas = df[["PERIODO_LETIVO", "DISCIPLINA", "PROFESSOR"]].dropna().drop_duplicates()
+        chaves = self._chaves_oferta(linhas)
+        oferta = pd.Series(
+            [self.ofertas.get(k) for k in chaves.itertuples(index=False, name=None)],
+            index=chaves.index, dtype="float64"
+        )
+        aloc = pd.DataFrame({
+            "oferta_id": oferta,
+            "professor_id": linhas.loc[chaves.index, "PROFESSOR"].map(self.professores),
+        }).dropna()
+        if adiar and len(aloc) < len(linhas):
+            self._pendentes_alocacoes.append(linhas.drop(aloc.index))
+        aloc = aloc.astype("int64").drop_duplicates(subset=["oferta_id"])
+        aloc = aloc[~aloc["oferta_id"].isin(self.alocadas)]
+        rows = [{"oferta_id": o, "professor_id": p} for o, p in aloc.itertuples(index=False, name=None)]
+        if rows:
+            # Uma alocação por oferta; alocações gravadas por outra sessão ficam como estão
+            gravadas = self.db.execute(
+                pg_insert(Alocacao).on_conflict_do_nothing(index_elements=["oferta_id"])
+                .returning(Alocacao.oferta_id),
+                rows
+            ).scalars().all()
+            self.stats[Alocacao.__tablename__] += len(gravadas)
+        self.alocadas.update(aloc["oferta_id"].tolist())
@@ -0,0 +1,145 @@
+import os
+import time
+import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import streamlit as st
+
+# Segundos que um job concluído fica guardado à espera da sessão que o criou
+JOB_TTL = int(os.getenv("GA_JOB_TTL", "3600"))
+
+
+class GAJob:
+    """
+    Execução do AG em segundo plano. O progresso (um registro do Logbook por
+    geração) é acumulado em `records` pelo callback do solver e lido pela
+    página a cada atualização; `cancel()` pede a parada na próxima geração.
+    O job fica `queued` até uma thread do `JobManager` começar a executá-lo;
+    `started` (e com ele o tempo decorrido e o ETA) conta a partir daí.
+    """
+
+    def __init__(self, owner, semestre, ngen):
+        self.id = uuid.uuid4().hex[:12]
+        self.owner = owner
+        self.semestre = semestre
+        self.ngen = ngen
+        self.status = "queued"
+        self.records = []
+        self.result = None
+        self.error = None
+        self.submitted = time.time()
+        self.started = None
+        self.finished = None
+        self._cancel = threading.Event()
+
+    def _on_generation(self, record):
+        self.records.append(dict(record))
+
+    def cancel(self):
+        self._cancel.set()
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    @property
+    def queued(self):
+        return self.status == "queued"
+
+    @property
+    def running(self):
+        """Ainda não terminou (na fila ou em execução)."""
+        return self.status in ("queued", "running")
+
+    @property
+    def generation(self):
+        return self.records[-1]["gen"] if self.records else 0
+
+    @property
+    def elapsed(self):
+        """Segundos em execução, sem contar a espera na fila."""
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.time()) - self.started
+
+    def eta(self):
+        """Segundos restantes estimados pelo ritmo médio das gerações já concluídas."""
+        gen = self.generation
+        if not self.running or gen == 0:
+            return None
+        return self.elapsed / gen * (self.ngen - gen)
+
+    def _run(self, solver, kwargs):
+        self.started = time.time()
+        self.status = "running"
+        try:
+            self.result = solver(callback=self._on_generation, cancel=self._cancel.is_set, **kwargs)
+            status = "cancelled" if self.cancelled else "done"
+        except Exception as e:
+            self.error = e
+            status = "error"
+        # `finished` antes do status: quem vê o job concluído já vê o horário
+        self.finished = time.time()
+        self.status = status
+
+
+class JobManager:
+    """
+    Fila de jobs do AG compartilhada pelo processo, com no máximo um job ativo
+    por sessão. Jobs concluídos saem quando a sessão lê o resultado
+    (`discard`), quando a mesma sessão agenda outro job ou, se a sessão
+    terminou antes, `ttl` segundos depois de concluídos.
+    """
+
+    def __init__(self, max_workers=4, ttl=JOB_TTL):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ga-job")
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self.ttl = ttl
+
+    def _evict(self, owner=None):
+        """Remove os jobs concluídos há mais de `ttl` e, com `owner`, os concluídos dele."""
+        limite = time.time() - self.ttl
+        for job_id, job in list(self._jobs.items()):
+            if job.running:
+                continue
+            if job.owner == owner or job.finished < limite:
+                del self._jobs[job_id]
+
+    def submit(self, owner, solver, total=None, **kwargs):
+        """
+        Agenda `solver(**kwargs)`; falha se `owner` já tiver um job em execução.
+        `total` é o número de registros esperados no Logbook (padrão: `ngen`).
+        """
+        with self._lock:
+            if self.active(owner) is not None:
+                raise RuntimeError("Já existe uma alocação em execução nesta sessão.")
+            self._evict(owner)
+            job = GAJob(owner, kwargs.get("semestre_nome"), total or kwargs.get("ngen", 0))
+            self._jobs[job.id] = job
+        self._executor.submit(job._run, solver, kwargs)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            self._evict()
+            return self._jobs.get(job_id)
+
+    def active(self, owner):
+        for job in list(self._jobs.values()):
+            if job.owner == owner and job.running:
+                return job
+        return None
+
+    def discard(self, job_id):
+        """Esquece um job já concluído (o resultado fica só na sessão que o leu)."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None and not job.running:
+                del self._jobs[job_id]
+
+
+@st.cache_resource
+def get_job_manager():
+    return JobManager()
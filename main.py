@@ -7,14 +7,13 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-from db import init_db, get_engine, get_session
+from db import init_db, get_engine
 from pages.professor import page_professor
 
 # inicializa o esquema
 init_db()
 
-# obtém engine e sessão (já cacheados no get_engine/get_session)
+# obtém o engine (já cacheado no get_engine); as páginas abrem sessões com session_scope()
 engine = get_engine()
-db = get_session()
 
 st.success("Banco de dados pronto e conectado!")
\ No newline at end of file
@@ -2,8 +2,9 @@ import streamlit as st
 import pandas as pd
 import io
 from datetime import datetime
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session, joinedload
-from db import Alocacao, Oferta, Professor, SemestreLetivo, Disciplina, get_session
+from db import Alocacao, Oferta, Professor, SemestreLetivo, Disciplina, session_scope
 
 def export_alocacoes_to_excel(db: Session, semestre_nome: str):
     """Gera e retorna um arquivo Excel com as alocações do semestre especificado."""
@@ -185,91 +186,94 @@ def create_alocacao(db: Session):
 
         submitted = st.form_submit_button("Salvar")
         if submitted:
-            exists = db.query(Alocacao).filter_by(
-                oferta_id=oferta_obj.id,
-                professor_id=prof_obj.id
-            ).first()
+            # Uma alocação por oferta (índice único em alocacao.oferta_id)
+            exists = db.query(Alocacao).filter_by(oferta_id=oferta_obj.id).first()
             if exists:
-                st.warning(f"Professor '{prof_obj.nome}' já está alocado para '{sel_oferta_label}'.")
+                st.warning(f"'{sel_oferta_label}' já está alocada para '{exists.professor.nome}'.")
             else:
                 nova = Alocacao(
                     oferta_id=oferta_obj.id,
                     professor_id=prof_obj.id
                 )
                 db.add(nova)
-                db.commit()
+                try:
+                    db.commit()
+                except IntegrityError:
+                    # Outra sessão alocou a oferta entre a consulta e o commit
+                    db.rollback()
+                    st.warning(f"'{sel_oferta_label}' acabou de ser alocada em outra sessão.")
+                    return
                 st.success(f"Alocação criada: {prof_obj.nome} → {sel_oferta_label}")
                 st.rerun()
 
 def page_alocacao():
     """Entry point para a seção de Alocação de Professores."""
     st.title("📊 Alocação de Professores")
-    db = get_session()
+    with session_scope() as db:
+        # Formulário de criação
+        create_alocacao(db)
 
-    # Formulário de criação
-    create_alocacao(db)
+        # Divisor
+        st.divider()
 
-    # Divisor
-    st.divider()
+        # Lista de alocações existentes
+        st.subheader("📋 Alocações Existentes")
+        list_alocacoes(db)
 
-    # Lista de alocações existentes
-    st.subheader("📋 Alocações Existentes")
-    list_alocacoes(db)
+        # Divisor
+        st.divider()
 
-    # Divisor
-    st.divider()
+        # Seção de exportação
+        st.subheader("📤 Exportar Alocações para Excel")
 
-    # Seção de exportação
-    st.subheader("📤 Exportar Alocações para Excel")
-
-    # Buscar semestres disponíveis
-    semestres = db.query(SemestreLetivo).order_by(SemestreLetivo.nome).all()
-
-    if not semestres:
-        st.warning("Não há semestres cadastrados.")
-        return
-
-    col1, col2 = st.columns([3, 1])
-
-    with col1:
-        semestre_selecionado = st.selectbox(
-            "Selecione o semestre para exportação:",
-            options=[s.nome for s in semestres],
-            key="export_semestre"
-        )
-
-    with col2:
-        # Alinhar o botão com o selectbox
-        st.write("")  # Espaço para alinhamento com o label
-        export_clicked = st.button("📊 Exportar Excel", type="primary", key="btn_export")
-
-    # Processar exportação quando o botão for clicado
-    if export_clicked:
-        with st.spinner("Gerando arquivo Excel..."):
-            excel_data, error = export_alocacoes_to_excel(db, semestre_selecionado)
+        # Buscar semestres disponíveis
+        semestres = db.query(SemestreLetivo).order_by(SemestreLetivo.nome).all()
 
-            if error:
-                st.error(error)
-            else:
-                # Gerar nome do arquivo com timestamp
-                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                filename = f"alocacoes_{semestre_selecionado.replace('/', '_')}_{timestamp}.xlsx"
-
-                # Mostrar o botão de download imediatamente
-                st.success(f"✅ Arquivo Excel gerado com sucesso!")
-
-                # Botão de download mais visível
-                st.download_button(
-                    label="📥 BAIXAR ARQUIVO EXCEL",
-                    data=excel_data,
-                    file_name=filename,
-                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                    key="download_excel_file",
-                    type="primary",
-                    use_container_width=True
-                )
+        if not semestres:
+            st.warning("Não há semestres cadastrados.")
+            return
 
-                st.info("💡 Clique no botão acima para baixar o arquivo para seu computador.")
+        col1, col2 = st.columns([3, 1])
+
+        with col1:
+            semestre_selecionado = st.selectbox(
+                "Selecione o semestre para exportação:",
+                options=[s.nome for s in semestres],
+                key="export_semestre"
+            )
+
+        with col2:
+            # Alinhar o botão com o selectbox
+            st.write("")  # Espaço para alinhamento com o label
+            export_clicked = st.button("📊 Exportar Excel", type="primary", key="btn_export")
+
+        # Processar exportação quando o botão for clicado
+        if export_clicked:
+            with st.spinner("Gerando arquivo Excel..."):
+                excel_data, error = export_alocacoes_to_excel(db, semestre_selecionado)
+
+                if error:
+                    st.error(error)
+                else:
+                    # Gerar nome do arquivo com timestamp
+                    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+                    filename = f"alocacoes_{semestre_selecionado.replace('/', '_')}_{timestamp}.xlsx"
+
+                    # Mostrar o botão de download imediatamente
+                    st.success(f"✅ Arquivo Excel gerado com sucesso!")
+
+                    # Botão de download mais visível
+                    st.download_button(
+                        label="📥 BAIXAR ARQUIVO EXCEL",
+                        data=excel_data,
+                        file_name=filename,
+                        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                        key="download_excel_file",
+                        type="primary",
+                        use_container_width=True
+                    )
+
+                    st.info("💡 Clique no botão acima para baixar o arquivo para seu computador.")
 
 # Execução da página
 page_alocacao()
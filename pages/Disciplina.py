@@ -1,7 +1,7 @@
 import streamlit as st
 import pandas as pd
 from sqlalchemy.orm import Session
-from db import Disciplina, AreaCompetencia, get_session
+from db import Disciplina, AreaCompetencia, session_scope
 
 
 def list_disciplinas(db: Session):
@@ -61,9 +61,9 @@ def create_disciplina(db: Session):
 def page_disciplina():
     """Entry point para a seção de Disciplinas."""
     st.title("📚 Disciplinas")
-    db = get_session()
-    create_disciplina(db)
-    st.markdown("---")
-    list_disciplinas(db)
+    with session_scope() as db:
+        create_disciplina(db)
+        st.markdown("---")
+        list_disciplinas(db)
 
 page_disciplina()
\ No newline at end of file
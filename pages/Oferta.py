@@ -1,7 +1,7 @@
 import streamlit as st
 import pandas as pd
 from sqlalchemy.orm import Session
-from db import Oferta, SemestreLetivo, Disciplina, get_session
+from db import Oferta, SemestreLetivo, Disciplina, session_scope
 
 
 def list_ofertas(db: Session):
@@ -67,9 +67,9 @@ def create_oferta(db: Session):
 def page_oferta():
     """Entry point para a seção de Oferta de Disciplina."""
     st.title("📋 Oferta de Disciplina")
-    db = get_session()
-    create_oferta(db)
-    st.markdown("---")
-    list_ofertas(db)
+    with session_scope() as db:
+        create_oferta(db)
+        st.markdown("---")
+        list_ofertas(db)
 
 page_oferta()
@@ -1,7 +1,7 @@
 import streamlit as st
 import pandas as pd
 from sqlalchemy.orm import Session
-from db import SemestreLetivo, get_session
+from db import SemestreLetivo, session_scope
 
 
 def list_semestres(db: Session):
@@ -53,9 +53,9 @@ def create_semestre(db: Session):
 def page_semestre():
     """Entry point para a seção de Semestre Letivo."""
     st.title("📅 Semestres Letivos")
-    db = get_session()
-    create_semestre(db)
-    st.markdown("---")
-    list_semestres(db)
+    with session_scope() as db:
+        create_semestre(db)
+        st.markdown("---")
+        list_semestres(db)
 
 page_semestre()
@@ -1,145 +1,532 @@
 import streamlit as st
 import pandas as pd
 import altair as alt
-import time
-from db import get_session, SemestreLetivo, Alocacao
-from ag import run_ga, load_data
-
-
-def salvar_alocacao(oferta_id, professor_id):
-    """Salva uma alocação no banco de dados"""
-    session = get_session()
-    try:
-        # Verifica se já existe alocação para esta oferta
-        existing = session.query(Alocacao).filter_by(oferta_id=oferta_id).first()
-        if existing:
-            return False, "Esta oferta já possui uma alocação."
-
-        # Cria nova alocação
-        nova_alocacao = Alocacao(oferta_id=oferta_id, professor_id=professor_id)
-        session.add(nova_alocacao)
+import os
+import uuid
+import numpy as np
+from functools import partial
+from sqlalchemy.dialects.postgresql import insert
+from db import session_scope, SemestreLetivo, Alocacao
+from ag import build_problem, warm_start_templates, EvaluatorPool, MUTATIONS, PHASE_FIELDS, StoppingCriteria
+from sa import COOLING
+from solvers import ENGINES, SolverResult, solve, compare, expected_records
+from batch import BatchResult, build_batch, run_batch
+from competence import get_competence_index
+from jobs import get_job_manager
+from checkpoint import latest_checkpoint
+
+
+# Linhas por INSERT na gravação em lote (limite de parâmetros por comando)
+LOTE_INSERT = 5_000
+
+
+def salvar_alocacoes(pares):
+    """
+    Salva várias alocações (pares oferta_id, professor_id) numa única
+    transação, com INSERT ... ON CONFLICT (oferta_id) DO NOTHING RETURNING:
+    ofertas que já possuem alocação (inclusive gravadas por outra sessão ao
+    mesmo tempo) são ignoradas sem abortar as demais. Devolve
+    {oferta_id: True se gravada, False se a oferta já estava alocada}.
+    """
+    pares = list(dict((int(o), int(p)) for o, p in pares).items())
+    resultado = dict.fromkeys((oferta_id for oferta_id, _ in pares), False)
+    with session_scope() as session:
+        for inicio in range(0, len(pares), LOTE_INSERT):
+            stmt = (
+                insert(Alocacao)
+                .values([
+                    {"oferta_id": oferta_id, "professor_id": professor_id}
+                    for oferta_id, professor_id in pares[inicio:inicio + LOTE_INSERT]
+                ])
+                .on_conflict_do_nothing(index_elements=["oferta_id"])
+                .returning(Alocacao.oferta_id)
+            )
+            for oferta_id in session.execute(stmt).scalars():
+                resultado[oferta_id] = True
         session.commit()
-        return True, "Alocação salva com sucesso!"
-    except Exception as e:
-        session.rollback()
-        return False, f"Erro ao salvar alocação: {str(e)}"
-    finally:
-        session.close()
+    return resultado
+
+
+def get_evaluator_pool(problem, workers):
+    """
+    Pool de avaliação da sessão, reaproveitado enquanto os dados do problema
+    (comparados pelo fingerprint, já que cada clique compila uma nova
+    instância) e o número de processos não mudarem. Ao terminar a sessão o
+    pool é coletado e encerrado.
+    """
+    pool = st.session_state.get('evaluator_pool')
+    if (pool is not None and not pool.closed and pool.workers == workers
+            and pool.problem.fingerprint() == problem.fingerprint()):
+        return pool
+    if pool is not None:
+        pool.close()
+    pool = EvaluatorPool(problem, workers)
+    st.session_state['evaluator_pool'] = pool
+    return pool
+
+
+def fitness_chart(records):
+    """Gráfico Altair da evolução do fitness a partir dos registros do Logbook."""
+    df_log = pd.DataFrame({
+        'Geração': [r['gen'] for r in records],
+        'MaxFitness': [r['max'] for r in records],
+        'AvgFitness': [r['avg'] for r in records],
+        'MinFitness': [r['min'] for r in records],
+    })
+    df_melt = df_log.melt(id_vars=['Geração'],
+                          value_vars=['MaxFitness', 'AvgFitness', 'MinFitness'],
+                          var_name='Tipo', value_name='Fitness')
+    return alt.Chart(df_melt).mark_line(point=True).encode(
+        x='Geração:Q',
+        y='Fitness:Q',
+        color='Tipo:N',
+        tooltip=['Geração', 'Tipo', 'Fitness']
+    ).interactive()
+
+
+def phase_chart(records):
+    """Barras empilhadas com os segundos de cada fase por geração."""
+    nomes = {
+        "t_select": "Seleção", "t_clone": "Clonagem", "t_crossover": "Crossover",
+        "t_mutation": "Mutação", "t_evaluate": "Avaliação",
+    }
+    df = pd.DataFrame([
+        {"Geração": r["gen"], "Fase": nomes[f], "Segundos": r[f]}
+        for r in records for f in PHASE_FIELDS
+    ])
+    return alt.Chart(df).mark_bar().encode(
+        x='Geração:O',
+        y=alt.Y('Segundos:Q', stack='zero'),
+        color=alt.Color('Fase:N', scale=alt.Scale(domain=list(nomes.values()))),
+        tooltip=['Geração', 'Fase', 'Segundos']
+    )
+
+
+def diversity_chart(records):
+    """Genomas distintos e distância de Hamming média por geração."""
+    df = pd.DataFrame([
+        {"Geração": r["gen"], "Métrica": nome, "Valor": r[campo]}
+        for r in records
+        for campo, nome in (("unique", "Genomas distintos"), ("hamming", "Hamming médio"))
+    ])
+    return alt.Chart(df).mark_line(point=True).encode(
+        x='Geração:Q',
+        y='Valor:Q',
+        color='Métrica:N',
+        tooltip=['Geração', 'Métrica', 'Valor']
+    ).interactive()
+
+
+def store_results(problem, best, log, duration):
+    """Monta o DataFrame de alocações e guarda o resultado na sessão."""
+    genes = np.frombuffer(best, dtype=np.intc)
+    match = problem.compete(genes, problem.oferta_area)
+    carga_total = problem.carga_por_professor(genes)
+    records = []
+    for idx, prof in enumerate(genes):
+        records.append({
+            "idx": idx,
+            "oferta_id": int(problem.oferta_ids[idx]),
+            "professor_id": int(problem.professor_ids[prof]),
+            "Professor": problem.professor_nome[prof],
+            "Titulacao": problem.professor_titulacao[prof],
+            "ModeloContrato": problem.professor_modelo[prof],
+            "NivelProf": int(problem.prof_nivel[prof]),
+            "CargaMax": float(problem.carga_maxima[prof]),
+            "Disciplina": problem.disciplina_nome[idx],
+            "Turma": problem.oferta_turma[idx],
+            "CH": float(problem.carga_horaria[idx]),
+            "NivelEsp": int(problem.nivel_esperado[idx]),
+            "AreaDisc": problem.area_nome[problem.oferta_area[idx]],
+            "Match": "✅" if match[idx] else "❌"
+        })
+    df_assign = pd.DataFrame(records)
+
+    # Armazenar dados na sessão para persistir entre interações
+    st.session_state['df_assign'] = df_assign
+    st.session_state['problem'] = problem
+    st.session_state['carga_total'] = carga_total
+    st.session_state['best'] = best
+    st.session_state['log'] = log
+    st.session_state['duration'] = duration
+    st.session_state['selected_allocations'] = {}
+
+
+@st.fragment(run_every=1.0)
+def show_job_progress():
+    """Acompanha o job do AG da sessão: progresso, gráfico parcial, ETA e cancelamento."""
+    manager = get_job_manager()
+    job = manager.get(st.session_state['ga_job_id'])
+    if job is None:
+        del st.session_state['ga_job_id']
+        return
+
+    if not job.running:
+        manager.discard(job.id)
+        del st.session_state['ga_job_id']
+        problem = st.session_state.pop('ga_problem')
+        if job.status == "error":
+            st.error(f"Falha na execução do AG: {job.error}")
+            return
+        if isinstance(job.result, BatchResult):
+            st.session_state['batch'] = job.result
+        elif isinstance(job.result, SolverResult):
+            store_results(problem, job.result.best, job.result.log, job.result.wall_time)
+        else:
+            # Comparação de motores: {motor: SolverResult}
+            st.session_state['comparison'] = job.result
+            st.session_state['comparison_problem'] = problem
+        st.rerun()
+
+    st.subheader("⏳ Alocação em execução")
+    if job.queued:
+        st.info("Aguardando na fila: todas as execuções do servidor estão ocupadas.")
+    st.progress(min(job.generation / job.ngen, 1.0), text=f"Geração {job.generation} de {job.ngen}")
+    records = list(job.records)
+    cols = st.columns(4)
+    if records:
+        cols[0].metric("Melhor fitness", f"{records[-1]['max']:.2f}")
+        cols[1].metric("Fitness médio", f"{records[-1]['avg']:.2f}")
+    cols[2].metric("Tempo decorrido", f"{job.elapsed:.0f} s")
+    eta = job.eta()
+    cols[3].metric("Tempo restante (estimado)", f"{eta:.0f} s" if eta is not None else "—")
+    if records:
+        st.altair_chart(fitness_chart(records), use_container_width=True)
+    if st.button("⏹️ Cancelar execução", disabled=job.cancelled):
+        job.cancel()
+
+
+def show_comparison():
+    """Fitness x tempo e x avaliações de cada motor comparado, com o resumo por critério."""
+    results = st.session_state['comparison']
+    problem = st.session_state['comparison_problem']
+    st.subheader("⚖️ Comparação de motores")
+
+    df_hist = pd.DataFrame([
+        {"Motor": ENGINES[name].label, "Tempo (s)": h["time"], "Avaliações": h["evals"], "Melhor fitness": h["best"]}
+        for name, res in results.items() for h in res.history
+    ])
+    cols = st.columns(2)
+    for col, x in zip(cols, ["Tempo (s)", "Avaliações"]):
+        col.altair_chart(alt.Chart(df_hist).mark_line(point=True).encode(
+            x=f"{x}:Q",
+            y="Melhor fitness:Q",
+            color="Motor:N",
+            tooltip=["Motor", x, "Melhor fitness"]
+        ).interactive(), use_container_width=True)
+
+    st.dataframe(pd.DataFrame([
+        {
+            "Motor": ENGINES[name].label,
+            "Fitness": res.fitness,
+            "Avaliações": res.evaluations,
+            "Tempo (s)": round(res.wall_time, 2),
+            **res.breakdown
+        }
+        for name, res in results.items()
+    ]), use_container_width=True)
+
+    escolhido = st.selectbox("Resultado a detalhar", list(results), format_func=lambda e: ENGINES[e].label)
+    if st.button("Usar este resultado"):
+        res = results[escolhido]
+        store_results(problem, res.best, res.log, res.wall_time)
+        del st.session_state['comparison']
+        del st.session_state['comparison_problem']
+        st.rerun()
+
+
+def show_batch():
+    """Resumo do modo em lote por semestre, com detalhamento e gravação conjunta."""
+    batch = st.session_state['batch']
+    st.subheader("🗂️ Resultado do modo em lote")
+    if any(len(grupo) > 1 for grupo in batch.groups):
+        st.caption(
+            "Semestres sobrepostos resolvidos em sequência com carga compartilhada: "
+            + "; ".join(" → ".join(grupo) for grupo in batch.groups if len(grupo) > 1)
+        )
+
+    st.dataframe(pd.DataFrame([
+        {
+            "Semestre": nome,
+            "Motor": ENGINES[res.engine].label,
+            "Ofertas": len(res.assignment),
+            "Fitness": res.fitness,
+            "Avaliações": res.evaluations,
+            "Tempo (s)": round(res.wall_time, 2),
+            **res.breakdown
+        }
+        for nome, res in sorted(batch.results.items())
+    ]), use_container_width=True)
+
+    cols = st.columns(2)
+    escolhido = cols[0].selectbox("Semestre a detalhar", sorted(batch.results))
+    if cols[0].button("Detalhar este semestre"):
+        res = batch.results[escolhido]
+        store_results(batch.problems[escolhido], res.best, res.log, res.wall_time)
+        st.rerun()
+
+    if cols[1].button("💾 Salvar todas as alocações do lote", type="primary"):
+        pares = [par for res in batch.results.values() for par in res.assignment.items()]
+        try:
+            resultado = salvar_alocacoes(pares)
+        except Exception as e:
+            st.error(f"Erro ao salvar alocações: {str(e)}")
+        else:
+            gravadas = sum(resultado.values())
+            st.success(f"✅ {gravadas} alocações salvas em {len(batch.results)} semestres.")
+            if gravadas < len(resultado):
+                st.warning(f"⚠️ {len(resultado) - gravadas} ofertas já possuíam alocação e foram ignoradas.")
+            del st.session_state['batch']
 
 
 def page_alocacao_ga():
     st.title("📊 Alocação de Professores (AG)")
 
     # Seleção de semestre
-    db = get_session()
-    semestres = db.query(SemestreLetivo).order_by(SemestreLetivo.nome).all()
-    sem_options = [""] + [s.nome for s in semestres]
+    with session_scope() as db:
+        semestres = [s.nome for s in db.query(SemestreLetivo).order_by(SemestreLetivo.nome)]
+    sem_options = [""] + semestres
     semestre = st.selectbox("Selecione o semestre letivo", sem_options, index=0)
 
+    engine = st.radio(
+        "Motor de otimização", list(ENGINES), horizontal=True,
+        format_func=lambda e: ENGINES[e].label
+    )
+
     # Parâmetros do AG em expander
     with st.expander("Parâmetros do Algoritmo Genético"):
         ngen = st.number_input("Número de gerações", value=50, min_value=1, step=1)
         pop_size = st.number_input("Tamanho da população", value=100, min_value=1, step=1)
         cxpb = st.slider("Probabilidade de crossover", 0.0, 1.0, 0.7)
         mutpb = st.slider("Probabilidade de mutação", 0.0, 1.0, 0.2)
+        seed_fraction = st.slider("Fração gulosa da população inicial", 0.0, 1.0, 0.0)
+        warm_start = st.slider(
+            "Fração semeada com alocações anteriores e a última melhor solução (warm start)",
+            0.0, 1.0, 0.0
+        )
+        mutation = st.selectbox(
+            "Operador de mutação", MUTATIONS,
+            format_func=lambda m: {
+                "reassign": "Reatribuir entre candidatos competentes",
+                "shift": "Aliviar professor sobrecarregado",
+                "mixed": "Misto (reatribuir + aliviar)",
+                "shuffle": "Embaralhar índices (original)",
+            }[m]
+        )
+        repair_cx = st.checkbox("Reparar carga máxima após o crossover", value=False)
+        lambda_ = st.number_input(
+            "Filhos por geração (λ) nos esquemas μ+λ e μ,λ (μ = tamanho da população)",
+            value=2 * int(pop_size), min_value=1, step=1
+        )
+        workers = st.number_input(
+            "Processos de avaliação (1 = sem paralelismo)",
+            value=1, min_value=1, max_value=os.cpu_count() or 1, step=1
+        )
+        instrument = st.checkbox("Instrumentar fases (tempo por fase e diversidade da população)", value=False)
+
+    with st.expander("Parâmetros do Simulated Annealing"):
+        sa_iters = st.number_input("Iterações", value=50_000, min_value=100, step=10_000)
+        cooling = st.selectbox(
+            "Resfriamento", COOLING,
+            format_func=lambda c: {"geometric": "Geométrico", "linear": "Linear"}[c]
+        )
+        t0 = st.number_input("Temperatura inicial (0 = estimada automaticamente)", value=0.0, min_value=0.0)
+        swap_prob = st.slider("Probabilidade de troca entre duas ofertas", 0.0, 1.0, 0.3)
+
+    with st.expander("Modelo de ilhas"):
+        st.caption("Usados pelo motor \"AG (ilhas)\": uma subpopulação eaSimple por processo.")
+        n_islands = st.number_input("Número de ilhas", value=os.cpu_count() or 1, min_value=1, step=1)
+        migration_interval = st.number_input("Migração a cada N gerações", value=10, min_value=1, step=1)
+        migrants = st.number_input("Migrantes por ilha", value=2, min_value=0, step=1)
+        topology = st.selectbox(
+            "Topologia", ["ring", "random"],
+            format_func=lambda t: {"ring": "Anel", "random": "Aleatória"}[t]
+        )
+
+    with st.expander("Critérios de parada"):
+        max_time = st.number_input("Tempo máximo (s, 0 = sem limite)", value=0.0, min_value=0.0, step=10.0)
+        stagnation = st.number_input(
+            "Parar após N gerações sem melhora (0 = desligado)", value=0, min_value=0, step=1
+        )
+        epsilon = st.number_input("Melhora mínima (ε)", value=0.0, min_value=0.0, step=1.0)
+        use_target = st.checkbox("Parar ao atingir um fitness alvo")
+        target = st.number_input("Fitness alvo", value=0.0, step=100.0, disabled=not use_target)
+
+    with st.expander("Checkpoints (execuções longas)"):
+        use_checkpoint = st.checkbox("Salvar checkpoints durante a execução (exceto no modelo de ilhas)")
+        checkpoint_every = st.number_input(
+            "A cada N gerações (0 = desligado)", value=10, min_value=0, step=1, disabled=not use_checkpoint
+        )
+        checkpoint_seconds = st.number_input(
+            "A cada T segundos (0 = desligado)", value=0.0, min_value=0.0, step=30.0, disabled=not use_checkpoint
+        )
+        ultimo = latest_checkpoint(semestre) if semestre else None
+        resume = False
+        if ultimo:
+            resume = st.checkbox(
+                f"Retomar do último checkpoint ({os.path.basename(ultimo)}) até o número de gerações acima"
+            )
+            st.caption(
+                "A retomada usa população, probabilidades e operadores da execução original; "
+                "daqui valem só o número de gerações e os critérios de parada."
+            )
+        elif semestre:
+            st.caption("Nenhum checkpoint salvo para este semestre.")
+
+    with st.expander("Comparar motores"):
+        comparar_engines = st.multiselect(
+            "Motores a executar no mesmo semestre", list(ENGINES), default=list(ENGINES),
+            format_func=lambda e: ENGINES[e].label
+        )
+        st.caption("Usa os parâmetros acima; checkpoints, warm start e ilhas não se aplicam à comparação.")
+
+    with st.expander("Modo em lote (vários semestres)"):
+        lote_semestres = st.multiselect("Semestres a otimizar", semestres)
+        compartilhar = st.checkbox(
+            "Compartilhar carga dos professores entre semestres com períodos sobrepostos", value=True
+        )
+        lote_workers = st.number_input(
+            "Processos (um grupo de semestres por processo)",
+            value=min(len(lote_semestres), os.cpu_count() or 1) or 1, min_value=1,
+            max_value=os.cpu_count() or 1, step=1
+        )
+        st.caption(
+            "Usa o motor e os parâmetros acima; checkpoints, warm start e avaliação paralela "
+            "não se aplicam ao lote."
+        )
 
-    # Botão de gerar alocação
-    generate = st.button("Gerar alocação", disabled=(semestre == ""))
+    # Botões de gerar alocação / comparar motores / lote (um job por sessão)
+    st.session_state.setdefault('ga_owner', uuid.uuid4().hex)
+    running = 'ga_job_id' in st.session_state
+    cols = st.columns(3)
+    generate = cols[0].button("Gerar alocação", disabled=(semestre == "" or running))
+    comparar = cols[1].button(
+        "Comparar motores selecionados", disabled=(semestre == "" or running or not comparar_engines)
+    )
+    lote = cols[2].button("Otimizar semestres em lote", disabled=(running or not lote_semestres))
+
+    ga_params = dict(
+        ngen=int(ngen),
+        pop_size=int(pop_size),
+        cxpb=float(cxpb),
+        mutpb=float(mutpb),
+        seed_fraction=float(seed_fraction),
+        mutation=mutation,
+        repair_cx=bool(repair_cx),
+        stagnation=int(stagnation) or None,
+        epsilon=float(epsilon),
+        instrument=bool(instrument)
+    )
+    sa_iters = int(sa_iters)
+    sa_params = dict(
+        iters=sa_iters,
+        t0=float(t0) or None,
+        cooling=cooling,
+        swap_prob=float(swap_prob),
+        log_every=max(1, sa_iters // 100)
+    )
+    # Parâmetros de todos os motores; `solve` repassa a cada um os seus
+    params = dict(
+        ga_params, **sa_params,
+        max_time=float(max_time) or None,
+        target=float(target) if use_target else None,
+        lambda_=int(lambda_),
+        n_islands=int(n_islands),
+        migration_interval=int(migration_interval),
+        migrants=int(migrants),
+        topology=topology
+    )
+
+    if lote:
+        # Uma consulta para todos os semestres; a otimização roda no job
+        problems, groups = build_batch(lote_semestres, share_load=compartilhar)
+        if not problems:
+            st.error("Não há disciplinas pendentes para alocação nos semestres selecionados.")
+            return
+        try:
+            job = get_job_manager().submit(
+                st.session_state['ga_owner'], partial(run_batch, problems, groups),
+                total=len(problems), engine=engine, workers=int(lote_workers), **params
+            )
+        except RuntimeError as e:
+            st.warning(str(e))
+            return
+        st.session_state['ga_job_id'] = job.id
+        st.session_state['ga_problem'] = None
 
-    if generate:
+    if generate or comparar:
         # Carrega dados e filtra apenas ofertas ainda não alocadas
-        professores, ofertas = load_data(semestre)
-        if not ofertas:
+        problem = build_problem(semestre)
+        if problem.n_ofertas == 0:
             st.error("Não há disciplinas pendentes para alocação neste semestre.")
             return
 
         # Verificar se há professores com competência para todas as disciplinas
-        areas_necessarias = set()
-        areas_disponiveis = set()
-
-        for oferta in ofertas:
-            areas_necessarias.add(oferta.disciplina.area.id)
-
-        for professor in professores:
-            for area in professor.areas:
-                areas_disponiveis.add(area.id)
+        areas_sem_professor = get_competence_index().areas_sem_professor(problem.area_ids)
 
-        areas_sem_professor = areas_necessarias - areas_disponiveis
-
-        if areas_sem_professor:
+        if len(areas_sem_professor):
             st.warning("⚠️ **Atenção: Há disciplinas sem professores com competência adequada:**")
 
             # Buscar nomes das áreas e disciplinas problemáticas
             disciplinas_problematicas = []
-            for oferta in ofertas:
-                if oferta.disciplina.area.id in areas_sem_professor:
-                    disciplinas_problematicas.append({
-                        "Disciplina": oferta.disciplina.nome,
-                        "Turma": oferta.turma,
-                        "Área": oferta.disciplina.area.nome,
-                        "CH": float(oferta.disciplina.carga_horaria)
-                    })
+            for j in np.flatnonzero(np.isin(problem.area_ids[problem.oferta_area], areas_sem_professor)):
+                disciplinas_problematicas.append({
+                    "Disciplina": problem.disciplina_nome[j],
+                    "Turma": problem.oferta_turma[j],
+                    "Área": problem.area_nome[problem.oferta_area[j]],
+                    "CH": float(problem.carga_horaria[j])
+                })
 
             df_problemas = pd.DataFrame(disciplinas_problematicas)
             st.dataframe(df_problemas, use_container_width=True)
 
             st.info("💡 O algoritmo genético tentará alocar essas disciplinas mesmo sem match de competência, mas com penalização no fitness.")
 
-        with st.spinner("Executando alocação..."):
-            start_time = time.time()
-            best, log = run_ga(
-                semestre_nome=semestre,
-                ngen=int(ngen),
-                pop_size=int(pop_size),
-                cxpb=float(cxpb),
-                mutpb=float(mutpb)
+        common = dict(params, semestre_nome=semestre, problem=problem)
+        usa_pool = any("pool" in ENGINES[e].params for e in (comparar_engines if comparar else [engine]))
+        if workers > 1 and usa_pool:
+            common["pool"] = get_evaluator_pool(problem, int(workers))
+        if comparar:
+            engines = list(comparar_engines)
+            solver = partial(compare, engines)
+        else:
+            engines = [engine]
+            solver = partial(solve, engine)
+            # Extras aceitos só por alguns motores; `solve` repassa a cada um os seus
+            common.update(
+                checkpoint_every=int(checkpoint_every) if use_checkpoint else None,
+                checkpoint_seconds=float(checkpoint_seconds) if use_checkpoint and checkpoint_seconds else None,
+                resume=ultimo if resume else None,
+                warm_start=float(warm_start),
+                save_best_run=True
             )
-            duration = time.time() - start_time
-
-        # Mapeamento rápido para lookup por ID
-        prof_map = {p.id: p for p in professores}
-
-        # Montar DataFrame de alocações
-        records = []
-        carga_total = {p.id: 0.0 for p in professores}
-        for idx, prof_id in enumerate(best):
-            prof = prof_map.get(prof_id)
-            oferta = ofertas[idx]
-            ch = float(oferta.disciplina.carga_horaria)
-            carga_total[prof.id] += ch
-            match = oferta.disciplina.area.id in {a.id for a in prof.areas}
-            records.append({
-                "idx": idx,
-                "oferta_id": oferta.id,
-                "professor_id": prof_id,
-                "Professor": prof.nome,
-                "Titulacao": prof.titulacao,
-                "ModeloContrato": prof.modelo_contratacao,
-                "NivelProf": prof.nivel,
-                "CargaMax": float(prof.carga_maxima),
-                "Disciplina": oferta.disciplina.nome,
-                "Turma": oferta.turma,
-                "CH": ch,
-                "NivelEsp": oferta.disciplina.nivel_esperado,
-                "AreaDisc": oferta.disciplina.area.nome,
-                "Match": "✅" if match else "❌"
-            })
-        df_assign = pd.DataFrame(records)
-
-        # Armazenar dados na sessão para persistir entre interações
-        st.session_state['df_assign'] = df_assign
-        st.session_state['ofertas'] = ofertas
-        st.session_state['professores'] = professores
-        st.session_state['carga_total'] = carga_total
-        st.session_state['best'] = best
-        st.session_state['log'] = log
-        st.session_state['duration'] = duration
+            if warm_start > 0 and "warm_templates" in ENGINES[engine].params:
+                # Lidos aqui: a sessão do banco não pode ser usada na thread do job
+                common["warm_templates"] = warm_start_templates(semestre, problem)
+        total = sum(expected_records(e, common) for e in engines)
+
+        # Executa em segundo plano; a página acompanha o progresso pelo id do job
+        try:
+            job = get_job_manager().submit(st.session_state['ga_owner'], solver, total=total, **common)
+        except RuntimeError as e:
+            st.warning(str(e))
+            return
+        st.session_state['ga_job_id'] = job.id
+        st.session_state['ga_problem'] = problem
+
+    if 'ga_job_id' in st.session_state:
+        show_job_progress()
+
+    if 'comparison' in st.session_state:
+        show_comparison()
+
+    if 'batch' in st.session_state:
+        show_batch()
 
     # Se existem dados na sessão, mostrar resultados
     if 'df_assign' in st.session_state:
         df_assign = st.session_state['df_assign']
-        ofertas = st.session_state['ofertas']
-        professores = st.session_state['professores']
+        problem = st.session_state['problem']
         carga_total = st.session_state['carga_total']
         best = st.session_state['best']
         log = st.session_state['log']
@@ -150,44 +537,45 @@ def page_alocacao_ga():
         st.markdown(f"**Melhor fitness:** `{best.fitness.values[0]:.2f}`")
         gens = log.select("gen")[-1] if hasattr(log, 'select') else len(log)
         st.markdown(f"**Gerações executadas:** {gens}")
+        reason = getattr(log, 'stop_reason', 'ngen')
+        st.markdown(f"**Critério de parada:** {StoppingCriteria.REASONS.get(reason, reason)}")
         st.markdown(f"**Tempo de execução:** {duration:.1f} s")
+        st.markdown(f"**Avaliações de fitness:** {sum(log.select('nevals'))}")
+        if 'cache_hit' in log.header:
+            st.markdown(
+                f"**Acertos no cache de fitness:** {log[-1]['cache_hit']:.0%} "
+                f"({log[-1]['cache_kb']:.0f} KB)"
+            )
 
-        # Evolução do Fitness
-        df_log = pd.DataFrame({
-            'Geração': log.select('gen'),
-            'MaxFitness': log.select('max'),
-            'AvgFitness': log.select('avg'),
-            'MinFitness': log.select('min'),
+        # Evolução do Fitness, ao lado do tempo por fase quando a execução foi instrumentada
+        if PHASE_FIELDS[0] in log.header:
+            cols = st.columns(2)
+            cols[0].altair_chart(fitness_chart(log), use_container_width=True)
+            cols[1].altair_chart(phase_chart(log), use_container_width=True)
+            st.altair_chart(diversity_chart(log), use_container_width=True)
+        else:
+            st.altair_chart(fitness_chart(log), use_container_width=True)
+
+        # Gráfico de barras: Horas Existente (alocações já salvas) vs Alocada vs Livre por Professor
+        tipos = ["Existente", "Alocada", "Livre"]
+        df_summary = pd.DataFrame({
+            "Professor": problem.professor_nome,
+            "Existente": problem.carga_base,
+            "Alocada": carga_total,
+            "Livre": np.maximum(0.0, problem.carga_maxima - problem.carga_base - carga_total)
         })
-        df_melt = df_log.melt(id_vars=['Geração'],
-                              value_vars=['MaxFitness', 'AvgFitness', 'MinFitness'],
-                              var_name='Tipo', value_name='Fitness')
-        fitness_chart = alt.Chart(df_melt).mark_line(point=True).encode(
-            x='Geração:Q',
-            y='Fitness:Q',
-            color='Tipo:N',
-            tooltip=['Geração', 'Tipo', 'Fitness']
-        ).interactive()
-        st.altair_chart(fitness_chart, use_container_width=True)
-
-        # Gráfico de barras: Horas Alocada vs Livre por Professor
-        df_summary = pd.DataFrame([
-            {"Professor": p.nome,
-             "Alocada": carga_total[p.id],
-             "Livre": max(0.0, float(p.carga_maxima) - carga_total[p.id])}
-            for p in professores
-        ])
         mdf = df_summary.melt(
             id_vars=["Professor"],
-            value_vars=["Alocada", "Livre"],
+            value_vars=tipos,
             var_name="Tipo", value_name="Horas"
         )
+        mdf["Ordem"] = mdf["Tipo"].map(tipos.index)
         bar_chart = alt.Chart(mdf).mark_bar().encode(
             x=alt.X("Professor:N", sort=None),
             y=alt.Y("Horas:Q"),
-            color=alt.Color("Tipo:N", scale=alt.Scale(domain=["Alocada", "Livre"])),
+            color=alt.Color("Tipo:N", scale=alt.Scale(domain=tipos)),
             order=alt.Order(
-                'Tipo:N',
+                'Ordem:Q',
                 sort='ascending'
             ),
             tooltip=["Professor", "Tipo", "Horas"]
@@ -196,12 +584,12 @@ def page_alocacao_ga():
 
         # Detalhamento por professor
         st.subheader("👨‍🏫 Detalhamento por Professor")
-        for p in professores:
-            prof_df = df_assign[df_assign["Professor"] == p.nome]
+        for i, nome in enumerate(problem.professor_nome):
+            prof_df = df_assign[df_assign["professor_id"] == problem.professor_ids[i]]
             if not prof_df.empty:
-                total = carga_total[p.id]
-                cap = float(p.carga_maxima)
-                label = f"{p.nome} — {total:.0f}/{cap:.0f}h"
+                total = problem.carga_base[i] + carga_total[i]
+                cap = float(problem.carga_maxima[i])
+                label = f"{nome} — {total:.0f}/{cap:.0f}h"
                 with st.expander(label):
                     st.table(prof_df[["Disciplina", "Turma", "CH", "NivelEsp", "AreaDisc", "Match"]])
 
@@ -303,17 +691,27 @@ def page_alocacao_ga():
                 errors = []
                 allocated_keys = []
 
-                # Processar apenas as alocações selecionadas
-                for idx, row in df_assign.iterrows():
-                    checkbox_key = f"select_{row['oferta_id']}_{row['professor_id']}"
-                    if st.session_state['selected_allocations'].get(checkbox_key, False):
-                        success, message = salvar_alocacao(row['oferta_id'], row['professor_id'])
-                        if success:
-                            success_count += 1
-                            allocated_keys.append(checkbox_key)
-                        else:
-                            error_count += 1
-                            errors.append(f"{row['Disciplina']} - {row['Turma']}: {message}")
+                # Processar apenas as alocações selecionadas, numa única transação
+                selecionadas = [
+                    row for _, row in df_assign.iterrows()
+                    if st.session_state['selected_allocations'].get(
+                        f"select_{row['oferta_id']}_{row['professor_id']}", False
+                    )
+                ]
+                try:
+                    resultado = salvar_alocacoes([(row['oferta_id'], row['professor_id']) for row in selecionadas])
+                except Exception as e:
+                    resultado = {}
+                    message = f"Erro ao salvar alocação: {str(e)}"
+                else:
+                    message = "Esta oferta já possui uma alocação."
+                for row in selecionadas:
+                    if resultado.get(int(row['oferta_id'])):
+                        success_count += 1
+                        allocated_keys.append(f"select_{row['oferta_id']}_{row['professor_id']}")
+                    else:
+                        error_count += 1
+                        errors.append(f"{row['Disciplina']} - {row['Turma']}: {message}")
 
                 # Feedback
                 if success_count > 0:
@@ -342,7 +740,7 @@ def page_alocacao_ga():
                                 del st.session_state['selected_allocations'][key]
                     else:
                         # Se não sobrou nenhuma alocação, limpar tudo
-                        for key in ['df_assign', 'ofertas', 'professores', 'carga_total', 'best', 'log', 'duration']:
+                        for key in ['df_assign', 'problem', 'carga_total', 'best', 'log', 'duration']:
                             if key in st.session_state:
                                 del st.session_state[key]
                         if 'selected_allocations' in st.session_state:
@@ -1,7 +1,7 @@
 import streamlit as st
 import pandas as pd
 from sqlalchemy.orm import Session
-from db import Professor, AreaCompetencia, get_session
+from db import Professor, AreaCompetencia, session_scope
 
 def list_professores(db: Session):
     """Exibe todos os professores em uma tabela."""
@@ -66,9 +66,9 @@ def create_professor(db: Session):
 def page_professor():
     """O entry point chamado em app.py para a seção 'Professor'."""
     st.title("👨‍🏫 Professores")
-    db = get_session()
-    create_professor(db)
-    st.markdown("---")
-    list_professores(db)
+    with session_scope() as db:
+        create_professor(db)
+        st.markdown("---")
+        list_professores(db)
 
 page_professor()
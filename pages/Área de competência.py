@@ -1,7 +1,7 @@
 import streamlit as st
 import pandas as pd
 from sqlalchemy.orm import Session
-from db import AreaCompetencia, get_session
+from db import AreaCompetencia, session_scope
 
 def list_areas(db: Session):
     """Exibe todas as áreas de competência em uma tabela."""
@@ -34,9 +34,9 @@ def create_area(db: Session):
 def page_area_competencia():
     """Entry point para a seção de Áreas de Competência."""
     st.title("🏷️ Áreas de Competência")
-    db = get_session()
-    create_area(db)
-    st.markdown("---")
-    list_areas(db)
+    with session_scope() as db:
+        create_area(db)
+        st.markdown("---")
+        list_areas(db)
 
 page_area_competencia()
\ No newline at end of file
@@ -0,0 +1,239 @@
+import hashlib
+from array import array
+from dataclasses import dataclass, field, fields
+
+import numpy as np
+
+
+# Ordem das colunas das tuplas aceitas por `ProblemInstance.from_rows`
+PROFESSOR_COLUMNS = ("id", "nome", "titulacao", "nivel", "carga_maxima", "modelo_contratacao")
+OFERTA_COLUMNS = (
+    "id", "turma", "disciplina_id", "disciplina_nome", "carga_horaria", "nivel_esperado", "area_id", "area_nome"
+)
+
+
+@dataclass
+class ProblemInstance:
+    """
+    Dados de um semestre compilados uma única vez por execução.
+
+    Professores, áreas e ofertas são remapeados para índices densos
+    (0..n-1); os indivíduos do AG guardam apenas o índice do professor de
+    cada oferta. Tudo aqui é vetor NumPy ou lista simples, sem objetos do
+    ORM, para que a instância seja barata de serializar para outros processos.
+    """
+
+    # Professores (índice denso -> colunas)
+    professor_ids: np.ndarray
+    professor_nome: list
+    professor_titulacao: list
+    professor_modelo: list
+    prof_nivel: np.ndarray
+    carga_maxima: np.ndarray
+    # Bitmatriz professor x área, empacotada com np.packbits ao longo das áreas
+    competencia: np.ndarray
+
+    # Áreas de competência
+    area_ids: np.ndarray
+    area_nome: list
+
+    # Ofertas (índice denso -> colunas)
+    oferta_ids: np.ndarray
+    oferta_turma: list
+    disciplina_ids: np.ndarray
+    disciplina_nome: list
+    oferta_area: np.ndarray
+    nivel_esperado: np.ndarray
+    carga_horaria: np.ndarray
+
+    # Horas que cada professor já tem alocadas no semestre (fora do genoma)
+    carga_base: np.ndarray = None
+
+    prof_pos: dict = field(default_factory=dict, repr=False)
+    _competentes: list = field(default=None, init=False, repr=False, compare=False)
+    _candidatos: list = field(default=None, init=False, repr=False, compare=False)
+    _fingerprint: str = field(default=None, init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        if self.carga_base is None:
+            self.carga_base = np.zeros(len(self.professor_ids), dtype=np.float64)
+        if not self.prof_pos:
+            self.prof_pos = {int(pid): i for i, pid in enumerate(self.professor_ids)}
+
+    @classmethod
+    def from_orm(cls, professores, ofertas, carga_existente=None, index=None):
+        """
+        Compila as listas de `Professor`/`Oferta` retornadas por `ag.load_data`.
+        `carga_existente` é {professor_id: horas já alocadas no semestre}.
+        Com `index` (um `competence.CompetenceIndex`) as competências vêm do
+        índice, só para as áreas das ofertas, e `Professor.areas` não é lido.
+        """
+        area_nomes = {}
+        if index is None:
+            for p in professores:
+                for a in p.areas:
+                    area_nomes[a.id] = a.nome
+        for o in ofertas:
+            area_nomes[o.disciplina.area.id] = o.disciplina.area.nome
+        area_ids = sorted(area_nomes)
+        area_pos = {a: i for i, a in enumerate(area_ids)}
+
+        competentes = None
+        if index is not None:
+            competencia = index.matriz([p.id for p in professores], area_ids)
+            competentes = index.competentes([p.id for p in professores], area_ids)
+        else:
+            matriz = np.zeros((len(professores), len(area_ids)), dtype=bool)
+            for i, p in enumerate(professores):
+                for a in p.areas:
+                    matriz[i, area_pos[a.id]] = True
+            competencia = np.packbits(matriz, axis=1)
+
+        instance = cls(
+            professor_ids=np.array([p.id for p in professores], dtype=np.int64),
+            professor_nome=[p.nome for p in professores],
+            professor_titulacao=[p.titulacao for p in professores],
+            professor_modelo=[p.modelo_contratacao for p in professores],
+            prof_nivel=np.array([p.nivel for p in professores], dtype=np.int16),
+            carga_maxima=np.array([float(p.carga_maxima) for p in professores], dtype=np.float64),
+            competencia=competencia,
+            area_ids=np.array(area_ids, dtype=np.int64),
+            area_nome=[area_nomes[a] for a in area_ids],
+            oferta_ids=np.array([o.id for o in ofertas], dtype=np.int64),
+            oferta_turma=[o.turma for o in ofertas],
+            disciplina_ids=np.array([o.disciplina_id for o in ofertas], dtype=np.int64),
+            disciplina_nome=[o.disciplina.nome for o in ofertas],
+            oferta_area=np.array([area_pos[o.disciplina.area.id] for o in ofertas], dtype=np.int32),
+            nivel_esperado=np.array([o.disciplina.nivel_esperado for o in ofertas], dtype=np.int16),
+            carga_horaria=np.array([float(o.disciplina.carga_horaria) for o in ofertas], dtype=np.float64),
+            carga_base=np.array(
+                [float((carga_existente or {}).get(p.id, 0.0)) for p in professores], dtype=np.float64
+            ),
+        )
+        instance._competentes = competentes
+        return instance
+
+    @classmethod
+    def from_rows(cls, professores, ofertas, index, carga_existente=None):
+        """
+        Compila as tuplas das consultas Core de `ag.load_data(mode="core")`,
+        na ordem de `PROFESSOR_COLUMNS` e `OFERTA_COLUMNS`, sem objetos do
+        ORM. As competências vêm de `index` (um `competence.CompetenceIndex`).
+        """
+        prof_cols = list(zip(*professores)) or [()] * len(PROFESSOR_COLUMNS)
+        of_cols = list(zip(*ofertas)) or [()] * len(OFERTA_COLUMNS)
+        prof_id, nome, titulacao, nivel, carga_maxima, modelo = prof_cols
+        oferta_id, turma, disciplina_id, disciplina_nome, carga_horaria, nivel_esperado, area_id, area_nome = of_cols
+
+        professor_ids = np.array(prof_id, dtype=np.int64)
+        oferta_area_id = np.array(area_id, dtype=np.int64)
+        area_ids, oferta_area = np.unique(oferta_area_id, return_inverse=True)
+        area_nomes = dict(zip(area_id, area_nome))
+        carga_existente = carga_existente or {}
+
+        instance = cls(
+            professor_ids=professor_ids,
+            professor_nome=list(nome),
+            professor_titulacao=list(titulacao),
+            professor_modelo=list(modelo),
+            prof_nivel=np.array(nivel, dtype=np.int16),
+            carga_maxima=np.array(carga_maxima, dtype=np.float64),
+            competencia=index.matriz(professor_ids, area_ids),
+            area_ids=area_ids,
+            area_nome=[area_nomes[a] for a in area_ids.tolist()],
+            oferta_ids=np.array(oferta_id, dtype=np.int64),
+            oferta_turma=list(turma),
+            disciplina_ids=np.array(disciplina_id, dtype=np.int64),
+            disciplina_nome=list(disciplina_nome),
+            oferta_area=oferta_area.astype(np.int32),
+            nivel_esperado=np.array(nivel_esperado, dtype=np.int16),
+            carga_horaria=np.array(carga_horaria, dtype=np.float64),
+            carga_base=np.array([float(carga_existente.get(p, 0.0)) for p in prof_id], dtype=np.float64),
+        )
+        instance._competentes = index.competentes(professor_ids, area_ids)
+        return instance
+
+    def fingerprint(self):
+        """
+        Hash do conteúdo da instância. Duas compilações dos mesmos dados têm o
+        mesmo fingerprint, o que permite reaproveitar recursos ligados a ela
+        (por exemplo, os workers de um `EvaluatorPool`).
+        """
+        if self._fingerprint is None:
+            h = hashlib.blake2b(digest_size=16)
+            for f in fields(self):
+                if f.name.startswith("_") or f.name == "prof_pos":
+                    continue
+                valor = getattr(self, f.name)
+                h.update(f.name.encode())
+                h.update(valor.tobytes() if isinstance(valor, np.ndarray) else repr(valor).encode())
+            self._fingerprint = h.hexdigest()
+        return self._fingerprint
+
+    @property
+    def n_profs(self):
+        return len(self.professor_ids)
+
+    @property
+    def n_ofertas(self):
+        return len(self.oferta_ids)
+
+    @property
+    def n_areas(self):
+        return len(self.area_ids)
+
+    def compete(self, prof_idx, area_idx):
+        """Consulta vetorizada na bitmatriz: o professor tem competência na área?"""
+        area_idx = np.asarray(area_idx)
+        byte = self.competencia[prof_idx, area_idx >> 3]
+        return ((byte >> (7 - (area_idx & 7))) & 1).astype(bool)
+
+    def competencia_matriz(self):
+        """Bitmatriz desempacotada (professores x áreas) como booleanos."""
+        return np.unpackbits(self.competencia, axis=1, count=self.n_areas).astype(bool)
+
+    def competentes(self):
+        """
+        Índices dos professores competentes em cada área (vazio se nenhum).
+        Instâncias compiladas com um `CompetenceIndex` já os recebem prontos;
+        nas demais saem de uma varredura da bitmatriz.
+        """
+        if self._competentes is None:
+            matriz = self.competencia_matriz()
+            self._competentes = [np.flatnonzero(matriz[:, a]).astype(np.intc) for a in range(self.n_areas)]
+        return self._competentes
+
+    def candidatos(self):
+        """
+        Domínio de genes por área: índices dos professores competentes em cada área.
+        Áreas sem nenhum professor competente caem para todos os professores.
+        """
+        if self._candidatos is None:
+            todos = np.arange(self.n_profs, dtype=np.intc)
+            self._candidatos = [cands if len(cands) else todos for cands in self.competentes()]
+        return self._candidatos
+
+    def candidatos_oferta(self, j):
+        """Professores candidatos para a oferta `j`."""
+        return self.candidatos()[self.oferta_area[j]]
+
+    def carga_por_professor(self, genes):
+        """Horas alocadas a cada professor por um indivíduo (sem a carga já existente)."""
+        return np.bincount(
+            np.asarray(genes, dtype=np.intp),
+            weights=self.carga_horaria,
+            minlength=self.n_profs
+        )
+
+    def carga_total(self, genes):
+        """Carga de cada professor no semestre: a já existente mais a do indivíduo."""
+        return self.carga_base + self.carga_por_professor(genes)
+
+
+def genome_matrix(population):
+    """Empilha indivíduos (`array('i')`) em uma matriz int indivíduos x ofertas."""
+    if isinstance(population, np.ndarray):
+        return population if population.ndim == 2 else population[np.newaxis, :]
+    if isinstance(population, array):
+        population = [population]
+    return np.vstack([np.frombuffer(ind, dtype=np.intc) for ind in population])
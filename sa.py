@@ -0,0 +1,237 @@
+import math
+import random
+
+import numpy as np
+from deap import creator, tools
+
+from ag import (
+    P_c, B_c, B_n, P_h, P_u, B_b,
+    build_problem, evaluate_population, init_greedy, init_individual, StoppingCriteria
+)
+
+# Esquemas de resfriamento aceitos por `run_sa`
+COOLING = ("geometric", "linear")
+
+
+class _Annealer:
+    """
+    Estado de uma trajetória do SA com as mesmas somas parciais do fitness
+    do AG, em floats Python, para avaliar cada movimento em O(1).
+    """
+
+    def __init__(self, problem, genes):
+        self.problem = problem
+        self.M = problem.n_profs
+        self.cm = problem.carga_maxima.tolist()
+        self.inv = [1.0 / c if c > 0 else 0.0 for c in self.cm]
+        self.ch = problem.carga_horaria.tolist()
+        self.pos = [1 if c > 0 else 0 for c in self.ch]
+        self.nivel = problem.prof_nivel.tolist()
+        self.esperado = problem.nivel_esperado.tolist()
+        self.area = problem.oferta_area.tolist()
+        self.cands = [c.tolist() for c in problem.candidatos()]
+        self.comp_set = [set(c.tolist()) for c in problem.competentes()]
+        self.reset(genes)
+
+    def reset(self, genes):
+        """Recalcula todas as somas a partir do genoma (também corrige o acúmulo de erro)."""
+        self.genes = list(genes)
+        self.carga = self.problem.carga_base.tolist()
+        self.n_pos = [1 if c > 0 else 0 for c in self.carga]
+        self.comp = 0.0
+        for j, p in enumerate(self.genes):
+            self.comp += self.pair(p, j)
+            self.carga[p] += self.ch[j]
+            self.n_pos[p] += self.pos[j]
+        self.excesso = sum(max(c - m, 0.0) for c, m in zip(self.carga, self.cm))
+        self.usados = sum(1 for n in self.n_pos if n > 0)
+        self.soma_r = sum(c * i for c, i in zip(self.carga, self.inv))
+        self.soma_r2 = sum((c * i) ** 2 for c, i in zip(self.carga, self.inv))
+        self.fitness = self.score(self.comp, self.excesso, self.usados, self.soma_r, self.soma_r2)
+
+    def pair(self, p, j):
+        score = B_c if p in self.comp_set[self.area[j]] else -P_c
+        if self.nivel[p] >= self.esperado[j]:
+            score += B_n
+        return score
+
+    def score(self, comp, excesso, usados, soma_r, soma_r2):
+        M = self.M
+        mean_r = soma_r / M
+        var_r = soma_r2 / M - mean_r * mean_r
+        sigma_r = math.sqrt(var_r) if var_r > 0.0 else 0.0
+        livres = M - usados
+        return (
+            comp
+            - (P_h * excesso if excesso > 0.0 else 0.0)
+            - P_u * livres * livres
+            + B_b * (1 - (sigma_r if sigma_r < 1.0 else 1.0))
+        )
+
+    def propose(self, swap_prob):
+        """
+        Sorteia um movimento. Reatribuição e troca mexem em dois professores
+        com variações opostas: `p` recebe `dc` horas (e `dn` ofertas
+        positivas) e `q` perde o mesmo. Devolve (dcomp, p, q, dc, dn, j, k),
+        com `k = -1` na reatribuição, ou None se o movimento não muda nada.
+        """
+        genes, area, rand = self.genes, self.area, random.random
+        n = len(genes)
+        if rand() < swap_prob:
+            j, k = int(rand() * n), int(rand() * n)
+            p, q = genes[j], genes[k]
+            if p == q:
+                return None
+            comp_j, comp_k = self.comp_set[area[j]], self.comp_set[area[k]]
+            if not ((q in comp_j or not comp_j) and (p in comp_k or not comp_k)):
+                return None
+            dcomp = self.pair(q, j) + self.pair(p, k) - self.pair(p, j) - self.pair(q, k)
+            return dcomp, p, q, self.ch[k] - self.ch[j], self.pos[k] - self.pos[j], j, k
+        j = int(rand() * n)
+        cands = self.cands[area[j]]
+        q = cands[int(rand() * len(cands))]
+        p = genes[j]
+        if q == p:
+            return None
+        return self.pair(q, j) - self.pair(p, j), p, q, -self.ch[j], -self.pos[j], j, -1
+
+    def delta(self, move):
+        """
+        Fitness após o movimento, em O(1). As novas somas ficam em
+        `self._pendente` para `apply`, sem alocar estruturas por professor.
+        """
+        dcomp, p, q, dc, dn, _, _ = move
+        carga, n_pos, cm, inv = self.carga, self.n_pos, self.cm, self.inv
+        cp0, cq0 = carga[p], carga[q]
+        cp1, cq1 = cp0 + dc, cq0 - dc
+        np0, nq0 = n_pos[p], n_pos[q]
+        np1, nq1 = np0 + dn, nq0 - dn
+        ip, iq = inv[p], inv[q]
+        rp0, rq0, rp1, rq1 = cp0 * ip, cq0 * iq, cp1 * ip, cq1 * iq
+
+        # Excesso de carga só muda nos dois professores do movimento
+        excesso = self.excesso
+        mp, mq = cm[p], cm[q]
+        if cp0 > mp:
+            excesso -= cp0 - mp
+        if cq0 > mq:
+            excesso -= cq0 - mq
+        if cp1 > mp:
+            excesso += cp1 - mp
+        if cq1 > mq:
+            excesso += cq1 - mq
+
+        usados = self.usados + (np1 > 0) + (nq1 > 0) - (np0 > 0) - (nq0 > 0)
+        soma_r = self.soma_r + rp1 + rq1 - rp0 - rq0
+        soma_r2 = self.soma_r2 + rp1 * rp1 + rq1 * rq1 - rp0 * rp0 - rq0 * rq0
+        comp = self.comp + dcomp
+        self._pendente = (comp, excesso, usados, soma_r, soma_r2, cp1, cq1, np1, nq1)
+        return self.score(comp, excesso, usados, soma_r, soma_r2)
+
+    def apply(self, move, fitness):
+        """Aplica o último movimento avaliado por `delta`."""
+        _, p, q, _, _, j, k = move
+        (self.comp, self.excesso, self.usados, self.soma_r, self.soma_r2,
+         self.carga[p], self.carga[q], self.n_pos[p], self.n_pos[q]) = self._pendente
+        if k < 0:
+            self.genes[j] = q
+        else:
+            self.genes[j], self.genes[k] = q, p
+        self.fitness = fitness
+
+
+def _initial_temperature(annealer, swap_prob, samples=200):
+    """T0 com aceitação inicial de ~80% dos movimentos que pioram o fitness."""
+    pioras = []
+    for _ in range(samples):
+        move = annealer.propose(swap_prob)
+        if move is None:
+            continue
+        fitness = annealer.delta(move)
+        if fitness < annealer.fitness:
+            pioras.append(annealer.fitness - fitness)
+    if not pioras:
+        return 1.0
+    return -(sum(pioras) / len(pioras)) / math.log(0.8)
+
+
+def run_sa(semestre_nome, problem=None, iters=50_000, t0=None, t_end_ratio=1e-4, cooling="geometric",
+           swap_prob=0.3, init="greedy", log_every=None, refresh=10_000, max_time=None, target=None,
+           callback=None, cancel=None):
+    """
+    Simulated annealing com movimentos de reatribuição e troca, cada um
+    avaliado em O(1) pelas somas parciais dos cinco critérios. A temperatura
+    vai de `t0` (estimada por amostragem se None) até `t0 * t_end_ratio` em
+    `iters` iterações, com resfriamento `geometric` ou `linear`.
+    Recebe as mesmas entradas de `run_ga` e devolve o mesmo `(best, log)`:
+    cada linha do Logbook resume um bloco de `log_every` iterações.
+    """
+    if cooling not in COOLING:
+        raise ValueError(f"Resfriamento desconhecido: {cooling!r}")
+    if problem is None:
+        problem = build_problem(semestre_nome)
+    log_every = log_every or max(1, iters // 100)
+
+    random.seed()
+    start = init_greedy(problem) if init == "greedy" else init_individual(problem)
+    annealer = _Annealer(problem, start)
+    t0 = t0 or _initial_temperature(annealer, swap_prob)
+    t_end = t0 * t_end_ratio
+    alpha = (t_end / t0) ** (1.0 / max(iters, 1))
+
+    best_genes, best_fitness = list(annealer.genes), annealer.fitness
+    stop = StoppingCriteria(max_time=max_time, target=target, cancel=cancel)
+    log = tools.Logbook()
+    log.header = ["gen", "nevals", "avg", "min", "max", "temp", "accepted"]
+    log.stop_reason = "ngen"
+    log.record(gen=0, nevals=1, avg=annealer.fitness, min=annealer.fitness, max=annealer.fitness,
+               temp=t0, accepted=0)
+    if callback is not None:
+        callback(log[-1])
+
+    rand, exp = random.random, math.exp
+    temp = t0
+    soma, minimo, maximo = 0.0, math.inf, -math.inf
+    nevals = aceitos = 0
+    for it in range(1, iters + 1):
+        move = annealer.propose(swap_prob)
+        if move is not None:
+            fitness = annealer.delta(move)
+            nevals += 1
+            delta = fitness - annealer.fitness
+            if delta >= 0 or rand() < exp(delta / temp):
+                annealer.apply(move, fitness)
+                aceitos += 1
+                if annealer.fitness > best_fitness:
+                    best_genes, best_fitness = list(annealer.genes), annealer.fitness
+        if it % refresh == 0:
+            annealer.reset(annealer.genes)
+
+        f = annealer.fitness
+        soma += f
+        if f < minimo:
+            minimo = f
+        if f > maximo:
+            maximo = f
+
+        if cooling == "geometric":
+            temp *= alpha
+        else:
+            temp = t0 - (t0 - t_end) * it / iters
+
+        if it % log_every == 0 or it == iters:
+            bloco = (it - 1) % log_every + 1
+            log.record(gen=len(log), nevals=nevals, avg=soma / bloco, min=minimo, max=maximo,
+                       temp=temp, accepted=aceitos)
+            if callback is not None:
+                callback(log[-1])
+            soma, minimo, maximo = 0.0, math.inf, -math.inf
+            nevals = aceitos = 0
+            reason = stop.check(best_fitness)
+            if reason is not None:
+                log.stop_reason = reason
+                break
+
+    best = creator.Individual(np.array(best_genes, dtype=np.intc).tobytes())
+    best.fitness.values = (float(evaluate_population([best], problem)[0]),)
+    return best, log
@@ -71,4 +71,7 @@ CREATE TABLE alocacao (
                           professor_id INT
                               REFERENCES professor(id)
                                   ON DELETE CASCADE
-);
\ No newline at end of file
+);
+
+-- Uma alocação por oferta (base do INSERT ... ON CONFLICT (oferta_id) DO NOTHING)
+CREATE UNIQUE INDEX IF NOT EXISTS uq_alocacao_oferta_id ON alocacao (oferta_id);
\ No newline at end of file
@@ -0,0 +1,163 @@
+import time
+import inspect
+from dataclasses import dataclass, field
+from typing import Callable
+
+import numpy as np
+
+from ag import run_ga, run_islands, build_problem, fitness_breakdown
+from sa import run_sa
+
+
+@dataclass
+class SolverResult:
+    """Resultado comum a todos os motores de otimização."""
+
+    engine: str
+    best: object
+    # {oferta_id: professor_id}
+    assignment: dict
+    fitness: float
+    # Parcela de cada critério no fitness (ver `ag.fitness_breakdown`)
+    breakdown: dict
+    log: object
+    evaluations: int
+    wall_time: float
+    # Um ponto por registro do log: tempo decorrido, avaliações acumuladas e melhor fitness até ali
+    history: list = field(default_factory=list)
+
+
+@dataclass(frozen=True)
+class Engine:
+    name: str
+    label: str
+    run: Callable
+    # Parâmetros aceitos; os demais são ignorados por `solve`
+    params: tuple
+
+
+ENGINES = {}
+
+GA_PARAMS = (
+    "ngen", "pop_size", "cxpb", "mutpb", "seed_fraction", "mutation", "repair_cx",
+    "max_time", "stagnation", "epsilon", "target", "cache_size", "instrument"
+)
+# Extras dos AGs de população única: avaliação paralela ou incremental, checkpoints e warm start
+GA_EXTRAS = (
+    "workers", "pool", "checkpoint_every", "checkpoint_seconds", "checkpoint_dir", "run_id",
+    "resume", "warm_start", "warm_templates", "save_best_run", "incremental"
+)
+ISLAND_PARAMS = ("n_islands", "migration_interval", "migrants", "topology")
+SA_PARAMS = ("iters", "t0", "t_end_ratio", "cooling", "swap_prob", "log_every", "max_time", "target")
+
+
+def register_engine(name, label, params, target):
+    """
+    Registra `func(semestre_nome, problem, callback, cancel, **params) -> (best, log)`
+    como motor. `target` é a função que `func` chama com os `params`; cada um
+    deles precisa ser um argumento dela, o que é conferido já no registro.
+    """
+    aceitos = inspect.signature(target).parameters
+    faltando = [p for p in params if p not in aceitos]
+    if faltando:
+        raise TypeError(f"Motor {name!r}: {target.__name__}() não aceita {', '.join(faltando)}")
+
+    def decorator(func):
+        ENGINES[name] = Engine(name, label, func, tuple(params))
+        return func
+    return decorator
+
+
+@register_engine("ea_simple", "AG (eaSimple)", GA_PARAMS + GA_EXTRAS, run_ga)
+def _run_ea_simple(semestre_nome, problem, **kwargs):
+    return run_ga(semestre_nome, problem=problem, algorithm="simple", **kwargs)
+
+
+@register_engine("mu_plus_lambda", "AG (μ+λ)", GA_PARAMS + GA_EXTRAS + ("lambda_",), run_ga)
+def _run_mu_plus_lambda(semestre_nome, problem, **kwargs):
+    return run_ga(semestre_nome, problem=problem, algorithm="mu_plus_lambda", **kwargs)
+
+
+@register_engine("mu_comma_lambda", "AG (μ,λ)", GA_PARAMS + GA_EXTRAS + ("lambda_",), run_ga)
+def _run_mu_comma_lambda(semestre_nome, problem, **kwargs):
+    return run_ga(semestre_nome, problem=problem, algorithm="mu_comma_lambda", **kwargs)
+
+
+@register_engine("islands", "AG (ilhas)", GA_PARAMS + ISLAND_PARAMS, run_islands)
+def _run_islands(semestre_nome, problem, **kwargs):
+    return run_islands(semestre_nome, problem=problem, **kwargs)
+
+
+@register_engine("sa", "Simulated annealing", SA_PARAMS, run_sa)
+def _run_sa(semestre_nome, problem, **kwargs):
+    return run_sa(semestre_nome, problem=problem, **kwargs)
+
+
+def expected_records(engine, params):
+    """Número de registros de log esperados de um motor (para barras de progresso)."""
+    if engine == "sa":
+        iters = params.get("iters", 50_000)
+        log_every = params.get("log_every") or max(1, iters // 100)
+        return -(-iters // log_every) + 1
+    return params.get("ngen", 50) + 1
+
+
+def solve(engine, semestre_nome, problem=None, callback=None, cancel=None, **params):
+    """
+    Executa um motor do registro e monta o `SolverResult`. Todos os motores
+    podem receber o mesmo dicionário de parâmetros: cada um usa só os seus.
+    """
+    spec = ENGINES[engine]
+    if problem is None:
+        problem = build_problem(semestre_nome)
+    kwargs = {k: v for k, v in params.items() if k in spec.params}
+
+    history = []
+    start = time.monotonic()
+
+    def on_record(record):
+        evals = (history[-1]["evals"] if history else 0) + record["nevals"]
+        best = max(history[-1]["best"], record["max"]) if history else record["max"]
+        history.append({"time": time.monotonic() - start, "evals": evals, "best": best})
+        if callback is not None:
+            callback(record)
+
+    best, log = spec.run(semestre_nome, problem, callback=on_record, cancel=cancel, **kwargs)
+    wall_time = time.monotonic() - start
+
+    genes = np.frombuffer(best, dtype=np.intc)
+    return SolverResult(
+        engine=engine,
+        best=best,
+        assignment={int(o): int(problem.professor_ids[g]) for o, g in zip(problem.oferta_ids, genes)},
+        fitness=best.fitness.values[0],
+        breakdown=fitness_breakdown(best, problem),
+        log=log,
+        evaluations=history[-1]["evals"] if history else 0,
+        wall_time=wall_time,
+        history=history,
+    )
+
+
+def compare(engines, semestre_nome, problem=None, callback=None, cancel=None, **params):
+    """
+    Executa os motores em sequência sobre o mesmo problema e devolve
+    {motor: SolverResult}. O `callback` recebe os registros de todos os
+    motores numerados em sequência em `gen`, com o nome em `engine`.
+    """
+    if problem is None:
+        problem = build_problem(semestre_nome)
+    results = {}
+    step = 0
+    for engine in engines:
+        if cancel is not None and cancel():
+            break
+
+        def relay(record, engine=engine):
+            nonlocal step
+            step += 1
+            if callback is not None:
+                callback({**record, "gen": step, "engine": engine})
+
+        results[engine] = solve(engine, semestre_nome, problem, callback=relay, cancel=cancel, **params)
+    return results